@@ -0,0 +1,340 @@
+"""
+Offline stand-ins for Discord and yt-dlp, enough to drive the Audio cog's
+commands without a gateway connection, a voice server, ffmpeg or network.
+
+Classes the cog type-checks (Member, VoiceClient, TextChannel) are subclassed
+so ``isinstance`` checks pass; nothing else from discord.py is initialised.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import itertools
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+
+import discord
+import yt_dlp
+
+from cogs.player import GuildPlayer
+
+_ids = itertools.count(1_000_000)
+
+FRAME_SECONDS = 0.02
+
+
+# ----- yt-dlp -----
+
+
+class FakeYoutubeDL:
+    """
+    Replacement for ``yt_dlp.YoutubeDL``. Behaviour is read from extra keys in
+    the options dict so it also works in process-mode extraction workers:
+
+    - ``fake_latency``: mean seconds per extraction
+    - ``fake_jitter``: standard deviation as a fraction of the mean
+    - ``fake_failure_rate``: probability an extraction raises DownloadError
+    - ``fake_throttle_rate``: probability it fails with an HTTP 429 instead
+    - ``fake_cpu_ms``: CPU time burned per extraction (JS/JSON work)
+    - ``fake_duration``: duration of every resolved track, in seconds
+    """
+
+    def __init__(self, params: dict[str, Any]) -> None:
+        self.params = params
+        self.rng = random.Random()
+
+    def extract_info(self, query: str, download: bool = False) -> dict[str, Any]:
+        latency = self.params.get("fake_latency", 0.5)
+        jitter = self.params.get("fake_jitter", 0.3)
+        time.sleep(max(0.0, self.rng.gauss(latency, latency * jitter)))
+
+        deadline = time.thread_time() + self.params.get("fake_cpu_ms", 0) / 1000
+        while time.thread_time() < deadline:
+            pass
+
+        if self.rng.random() < self.params.get("fake_failure_rate", 0.0):
+            raise yt_dlp.utils.DownloadError(f"fake failure for {query!r}")
+        if self.rng.random() < self.params.get("fake_throttle_rate", 0.0):
+            raise yt_dlp.utils.DownloadError("HTTP Error 429: Too Many Requests")
+
+        marker = "watch?v="
+        if marker in query:
+            video_id = query.split(marker, 1)[1][:11]
+        else:
+            video_id = hashlib.sha1(query.encode()).hexdigest()[:11]
+        expires = int(time.time()) + 6 * 3600
+        formats = [
+            {
+                "format_id": format_id,
+                "url": f"synthetic://{video_id}?itag={format_id}&expire={expires}",
+                "acodec": acodec,
+                "abr": abr,
+                "vcodec": "none",
+                "protocol": "https",
+            }
+            for format_id, acodec, abr in (
+                ("249", "opus", 50.0),
+                ("250", "opus", 70.0),
+                ("140", "mp4a.40.2", 129.5),
+                ("251", "opus", 128.0),
+            )
+        ]
+        return {
+            "id": video_id,
+            "title": f"Synthetic track {video_id}",
+            "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+            "duration": self.params.get("fake_duration", 180),
+            "url": f"synthetic://{video_id}?expire={expires}",
+            "thumbnail": None,
+            "http_headers": {},
+            "acodec": "opus",
+            "abr": 128.0,
+            "formats": formats,
+        }
+
+
+# ----- Audio -----
+
+
+class SyntheticAudio(discord.AudioSource):
+    """Fixed-size Opus-like packets for ``seconds`` of audio."""
+
+    PACKET = b"\xfc" + bytes(159)
+
+    def __init__(self, seconds: float) -> None:
+        self.remaining = int(seconds / FRAME_SECONDS)
+
+    def read(self) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        self.remaining -= 1
+        return self.PACKET
+
+    def is_opus(self) -> bool:
+        return True
+
+
+class SyntheticPlayer(GuildPlayer):
+    """GuildPlayer that plays synthetic audio instead of spawning ffmpeg."""
+
+    def build_source(self, track, start: float = 0.0) -> discord.AudioSource:
+        return SyntheticAudio((track.duration or 180) - start)
+
+
+# ----- Discord -----
+
+
+class FakeMessage:
+    def __init__(self, channel: Any, embed: Optional[discord.Embed]) -> None:
+        self.id = next(_ids)
+        self.channel = channel
+        self.embed = embed
+
+    async def edit(self, *, embed: Optional[discord.Embed] = None, **_: Any) -> "FakeMessage":
+        await asyncio.sleep(getattr(self.channel, "api_latency", 0))
+        self.embed = embed
+        return self
+
+
+class FakeGuild:
+    def __init__(self, name: str) -> None:
+        self.id = next(_ids)
+        self.name = name
+        self.voice_client: Optional["FakeVoiceClient"] = None
+        self.members: list["FakeMember"] = []
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild: FakeGuild, speedup: float, bitrate: int = 64000) -> None:
+        self.id = next(_ids)
+        self.name = f"voice-{self.id}"
+        self.guild = guild
+        self.bitrate = bitrate
+        self.members: list["FakeMember"] = []
+        self.speedup = speedup
+
+    async def connect(self, **_: Any) -> "FakeVoiceClient":
+        client = FakeVoiceClient(self)
+        self.guild.voice_client = client
+        return client
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, guild: FakeGuild, api_latency: float) -> None:
+        self.id = next(_ids)
+        self.name = f"text-{self.id}"
+        self.guild = guild  # type: ignore[assignment]
+        self.api_latency = api_latency
+        self.last_message_id = None
+        self.sent = 0
+
+    async def send(self, *args: Any, embed: Optional[discord.Embed] = None, **_: Any):
+        await asyncio.sleep(self.api_latency)
+        self.sent += 1
+        message = FakeMessage(self, embed)
+        self.last_message_id = message.id
+        return message
+
+
+class FakeMember(discord.Member):
+    def __init__(self, guild: FakeGuild, channel: Optional[FakeVoiceChannel]) -> None:
+        self._fake_id = next(_ids)
+        self.guild = guild  # type: ignore[assignment]
+        self._fake_channel = channel
+
+    @property
+    def id(self) -> int:  # type: ignore[override]
+        return self._fake_id
+
+    @property
+    def bot(self) -> bool:  # type: ignore[override]
+        return False
+
+    @property
+    def name(self) -> str:  # type: ignore[override]
+        return f"member-{self._fake_id}"
+
+    @property
+    def mention(self) -> str:  # type: ignore[override]
+        return f"<@{self._fake_id}>"
+
+    @property
+    def voice(self):  # type: ignore[override]
+        if self._fake_channel is None:
+            return None
+        return SimpleNamespace(channel=self._fake_channel)
+
+
+class FakeVoiceClient(discord.VoiceClient):
+    """
+    Plays sources on a thread like discord.py's AudioPlayer, pacing frames at
+    20 ms divided by the channel's ``speedup``, but sends nothing anywhere.
+    """
+
+    def __init__(self, channel: FakeVoiceChannel) -> None:
+        self.channel = channel  # type: ignore[assignment]
+        self._connected_flag = True
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.frames_sent = 0
+
+    def is_connected(self) -> bool:
+        return self._connected_flag
+
+    def is_playing(self) -> bool:
+        # Like AudioPlayer, a finished source counts as stopped before ``after`` runs
+        return self._thread is not None and not self._stop.is_set()
+
+    def is_paused(self) -> bool:
+        return False
+
+    def play(
+        self,
+        source: discord.AudioSource,
+        *,
+        after: Optional[Callable[[Optional[Exception]], Any]] = None,
+        **_: Any,
+    ) -> None:
+        if self.is_playing():
+            raise discord.ClientException("Already playing audio.")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(source, after, self._stop), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, source, after, stop: threading.Event) -> None:
+        interval = FRAME_SECONDS / self.channel.speedup
+        next_at = time.perf_counter()
+        error: Optional[Exception] = None
+        try:
+            while not stop.is_set():
+                if not source.read():
+                    break
+                self.frames_sent += 1
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        except Exception as e:
+            error = e
+        finally:
+            stop.set()
+            source.cleanup()
+        if after is not None:
+            after(error)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def move_to(self, channel, **_: Any) -> None:
+        self.channel = channel
+
+    async def disconnect(self, *, force: bool = False) -> None:
+        self.stop()
+        self._connected_flag = False
+        self.channel.guild.voice_client = None
+
+
+class _FakeResponse:
+    def __init__(self) -> None:
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **_: Any) -> None:
+        self._done = True
+
+    async def send_message(self, *args: Any, **_: Any) -> None:
+        self._done = True
+
+
+class _FakeFollowup:
+    def __init__(self, channel: FakeTextChannel, api_latency: float) -> None:
+        self.channel = channel
+        self.api_latency = api_latency
+        self.messages: list[FakeMessage] = []
+
+    async def send(self, *args: Any, embed: Optional[discord.Embed] = None, **_: Any):
+        await asyncio.sleep(self.api_latency)
+        message = FakeMessage(self.channel, embed)
+        self.messages.append(message)
+        return message
+
+
+class FakeInteraction:
+    def __init__(self, member: FakeMember, channel: FakeTextChannel) -> None:
+        self.id = next(_ids)
+        self.user = member
+        self.guild = member.guild
+        self.guild_id = member.guild.id
+        self.channel = channel
+        self.created_at = discord.utils.utcnow()
+        self.expires_at = self.created_at + datetime.timedelta(minutes=15)
+        self.response = _FakeResponse()
+        self.followup = _FakeFollowup(channel, channel.api_latency)
+
+    def is_expired(self) -> bool:
+        return discord.utils.utcnow() >= self.expires_at
+
+
+def make_bot() -> SimpleNamespace:
+    """The parts of MusicBot the Audio cog touches outside of commands."""
+    return SimpleNamespace(loop=asyncio.get_running_loop(), user=SimpleNamespace(id=0))
+
+
+def make_guild(
+    listeners: int, speedup: float, api_latency: float
+) -> tuple[FakeGuild, FakeVoiceChannel, FakeTextChannel]:
+    guild = FakeGuild(f"guild-{next(_ids)}")
+    voice_channel = FakeVoiceChannel(guild, speedup)
+    text_channel = FakeTextChannel(guild, api_latency)
+    for _ in range(listeners):
+        member = FakeMember(guild, voice_channel)
+        guild.members.append(member)
+        voice_channel.members.append(member)
+    return guild, voice_channel, text_channel
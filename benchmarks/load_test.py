@@ -0,0 +1,261 @@
+"""
+Offline load test for the Audio cog.
+
+Drives /summon, /play, /queue and /skip across N simulated guilds using the
+fakes in ``benchmarks.fakes`` (no Discord, YouTube, ffmpeg or libopus needed)
+and reports command latency percentiles, event-loop lag, extraction
+throughput and memory per guild.
+
+    python -m benchmarks.load_test --guilds 200 --latency 0.8 --failure-rate 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict
+
+# The bot reads its settings at import time; keep the benchmark self-contained
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("DEBUG_GUILD_ID", "")
+os.environ.setdefault("SEARCH_CACHE_PATH", "")
+os.environ.setdefault("AUDIO_CACHE_DIR", "")
+os.environ.setdefault("QUEUE_JOURNAL_PATH", "")
+os.environ.setdefault("SUGGESTIONS_PATH", "")
+os.environ.setdefault("LOUDNESS_PATH", "")
+
+import cogs.audio  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    FakeInteraction,
+    FakeYoutubeDL,
+    SyntheticPlayer,
+    make_bot,
+    make_guild,
+)
+from services.extraction_controller import ExtractionController  # noqa: E402
+from services.extraction_pool import ExtractionPool  # noqa: E402
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a fixed-interval sleep."""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - started - self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.rng = random.Random(args.seed)
+        # Zipf-ish popularity so the caches and request coalescing see realistic reuse
+        self.queries = [f"synthetic song {i}" for i in range(args.queries)]
+        self.weights = [1 / (rank + 1) for rank in range(args.queries)]
+
+    def build_cog(self) -> cogs.audio.Audio:
+        # The fake voice client never encodes audio, so libopus isn't required
+        cogs.audio.ensure_opus_loaded = lambda: None
+        cog = cogs.audio.Audio(make_bot())  # type: ignore[arg-type]
+        cog.player_class = SyntheticPlayer
+
+        service = cog.yt_service
+        service.pool.close()
+        service.pool = ExtractionPool(
+            {
+                **service.ydl_options,
+                "fake_latency": self.args.latency,
+                "fake_jitter": self.args.jitter,
+                "fake_failure_rate": self.args.failure_rate,
+                "fake_throttle_rate": self.args.throttle_rate,
+                "fake_cpu_ms": self.args.cpu_ms,
+                "fake_duration": self.args.track_seconds,
+            },
+            workers=self.args.workers,
+            mode=self.args.mode,
+            queue_size=self.args.queue_size,
+            timeout=cogs.audio.config.extraction_timeout,
+            ydl_factory=FakeYoutubeDL,
+        )
+        config = cogs.audio.config
+        service.controller = ExtractionController(
+            max_limit=self.args.workers,
+            queue_size=self.args.queue_size,
+            latency_target=config.extraction_latency_target,
+            failure_threshold=config.breaker_failure_threshold,
+            cooldown=config.breaker_cooldown,
+            max_cooldown=config.breaker_max_cooldown,
+        )
+        return cog
+
+    def pick_query(self) -> str:
+        return self.rng.choices(self.queries, self.weights)[0]
+
+    async def timed(self, name: str, coro) -> None:
+        started = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            self.errors[name] += 1
+            if self.args.verbose:
+                print(f"{name} failed: {e!r}")
+        self.latencies[name].append(time.perf_counter() - started)
+
+    async def think(self) -> None:
+        await asyncio.sleep(self.rng.uniform(0, self.args.think))
+
+    async def run_guild(self, cog: cogs.audio.Audio, index: int) -> None:
+        await asyncio.sleep(index * self.args.ramp / max(1, self.args.guilds))
+        guild, _, text_channel = make_guild(
+            self.args.listeners, self.args.speedup, self.args.api_latency
+        )
+        member = guild.members[0]
+
+        def interaction() -> FakeInteraction:
+            return FakeInteraction(member, text_channel)
+
+        await self.timed("summon", cog.summon.callback(cog, interaction()))
+        await self.timed(
+            "play", cog.play.callback(cog, interaction(), query=self.pick_query())
+        )
+        for _ in range(self.args.tracks):
+            await self.think()
+            await self.timed(
+                "queue", cog.queue.callback(cog, interaction(), query=self.pick_query())
+            )
+        for _ in range(self.args.skips):
+            await self.think()
+            await self.timed("skip", cog.skip.callback(cog, interaction()))
+
+    async def run(self) -> None:
+        args = self.args
+        cog = self.build_cog()
+        monitor = LoopLagMonitor()
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+        rss_before = rss_bytes()
+
+        monitor.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_guild(cog, i) for i in range(args.guilds)))
+        wall = time.perf_counter() - started
+        # Let the last skips and look-aheads settle while playback continues
+        await asyncio.sleep(args.settle)
+        monitor.stop()
+
+        rss_after = rss_bytes()
+        traced_after = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+        active = len(cog.players)
+        idle_timers = len(cog.reaper)
+        tasks = len(asyncio.all_tasks())
+        pool_stats = cog.yt_service.pool.stats()
+        controller_stats = cog.yt_service.controller.stats()
+        status_stats = cog.dispatcher.stats()
+        cache_stats = cog.yt_service.cache_stats()
+        coalesced = cog.yt_service.inflight.coalesced
+        gaps = [gap for player in cog.players.values() for gap in player.track_gaps]
+
+        await cog.cog_unload()
+        self.report(wall, monitor.samples, pool_stats, cache_stats, coalesced, gaps)
+        print()
+        print(f"extraction controller: {controller_stats}")
+        print(f"status messages: {status_stats}")
+        print(f"active guild players: {active} ({idle_timers} idle timers, {tasks} asyncio tasks)")
+        print(f"rss growth per guild: {(rss_after - rss_before) / args.guilds / 1024:.1f} KiB")
+        if args.tracemalloc:
+            per_guild = (traced_after - traced_before) / args.guilds / 1024
+            print(f"traced python memory per guild: {per_guild:.1f} KiB")
+
+    def report(self, wall, lag, pool_stats, cache_stats, coalesced, gaps) -> None:
+        print(f"{self.args.guilds} guilds in {wall:.2f}s ({self.args.mode} extraction, {self.args.workers} workers)")
+        print()
+        print(f"{'command':<10}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, values in self.latencies.items():
+            print(
+                f"{name:<10}{len(values):>7}{self.errors[name]:>8}"
+                f"{percentile(values, 50) * 1000:>10.1f}"
+                f"{percentile(values, 90) * 1000:>10.1f}"
+                f"{percentile(values, 99) * 1000:>10.1f}"
+                f"{max(values) * 1000:>10.1f}"
+            )
+        print()
+        print(
+            f"event loop lag: p50 {percentile(lag, 50) * 1000:.2f} ms, "
+            f"p99 {percentile(lag, 99) * 1000:.2f} ms, max {max(lag, default=0) * 1000:.2f} ms"
+        )
+        completed = pool_stats["completed"]
+        print(
+            f"extractions: {completed} completed ({completed / wall:.1f}/s), "
+            f"{pool_stats['failed']} failed, {pool_stats['timed_out']} timed out, "
+            f"{pool_stats['rejected']} rejected, {coalesced} coalesced"
+        )
+        print(f"search cache: {cache_stats}")
+        if gaps:
+            print(
+                f"track gaps: {len(gaps)} handoffs, "
+                f"mean {statistics.mean(gaps) * 1000:.1f} ms, max {max(gaps) * 1000:.1f} ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--listeners", type=int, default=3, help="members per voice channel")
+    parser.add_argument("--tracks", type=int, default=5, help="/queue calls per guild")
+    parser.add_argument("--skips", type=int, default=3, help="/skip calls per guild")
+    parser.add_argument("--queries", type=int, default=500, help="distinct search queries")
+    parser.add_argument("--think", type=float, default=1.0, help="max seconds between commands")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds to start all guilds")
+    parser.add_argument("--settle", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean extraction seconds")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="HTTP 429 rate")
+    parser.add_argument("--cpu-ms", type=float, default=10.0, help="CPU per extraction")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Discord REST round trip")
+    parser.add_argument("--track-seconds", type=float, default=180)
+    parser.add_argument("--speedup", type=float, default=10.0, help="playback time compression")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    asyncio.run(LoadTest(parser.parse_args()).run())
+
+
+if __name__ == "__main__":
+    main()
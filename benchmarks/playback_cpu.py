@@ -0,0 +1,147 @@
+"""
+CPU cost per stream for each playback path.
+
+Reads a source end to end the way discord.py's player thread would (PCM is
+encoded to Opus in-process, Opus sources are passed through) and reports the
+CPU time spent in this process and in ffmpeg per second of audio. For
+``pcm-pool`` the ffmpeg column includes the encode worker processes.
+
+    python -m benchmarks.playback_cpu [--input FILE_OR_URL] [--streams N]
+
+Without ``--input`` a 60 second Opus/WebM test file is generated with ffmpeg,
+so the benchmark runs offline.
+"""
+
+import argparse
+import ctypes.util
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+
+import discord
+
+from cogs.sources import create_ffmpeg_source
+from services.encode_pool import EncodePool
+
+FRAME_SECONDS = 0.02
+
+MODES = {
+    "pcm": {"mode": "pcm"},
+    "pcm-pool": {"mode": "pcm", "encode_pool": True},
+    "opus-transcode": {"mode": "opus", "passthrough": False},
+    "opus-copy": {"mode": "opus", "passthrough": True},
+}
+
+
+def ensure_opus() -> None:
+    if not discord.opus.is_loaded():
+        discord.opus.load_opus(ctypes.util.find_library("opus") or "libopus.so.0")
+
+
+def generate_input(directory: str, seconds: int) -> str:
+    path = os.path.join(directory, "bench.webm")
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-f", "lavfi", "-i", f"anoisesrc=duration={seconds}:amplitude=0.1",
+            "-filter_complex", "amix=inputs=2,aformat=channel_layouts=stereo",
+            "-c:a", "libopus", "-b:a", "128k", "-ar", "48000",
+            path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def drain(source: discord.AudioSource, frames: list[int]) -> None:
+    """Consume a source like discord.py's AudioPlayer, without the pacing."""
+    encoder = None if source.is_opus() else discord.opus.Encoder()
+    count = 0
+    try:
+        while True:
+            data = source.read()
+            if not data:
+                break
+            if encoder is not None:
+                encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+            count += 1
+    finally:
+        source.cleanup()
+    frames.append(count)
+
+
+def cpu_seconds() -> tuple[float, float]:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+
+def run_mode(
+    name: str, stream_url: str, streams: int, encode_processes: int
+) -> dict[str, float]:
+    frames: list[int] = []
+    own_before, child_before = cpu_seconds()
+    started = time.perf_counter()
+
+    options = dict(MODES[name])
+    pool = None
+    if options.pop("encode_pool", False):
+        pool = EncodePool(encode_processes, initializer=ensure_opus)
+        options["encode_pool"] = pool
+    threads = [
+        threading.Thread(
+            target=drain, args=(create_ffmpeg_source(stream_url, **options), frames)
+        )
+        for _ in range(streams)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if pool is not None:
+        # Workers' CPU time is only counted once they've exited
+        pool.close()
+
+    wall = time.perf_counter() - started
+    own_after, child_after = cpu_seconds()
+    audio_seconds = sum(frames) * FRAME_SECONDS or 1.0
+    own = own_after - own_before
+    ffmpeg = child_after - child_before
+    return {
+        "wall_s": wall,
+        "bot_cpu_ms_per_audio_s": own / audio_seconds * 1000,
+        "ffmpeg_cpu_ms_per_audio_s": ffmpeg / audio_seconds * 1000,
+        "total_cpu_ms_per_audio_s": (own + ffmpeg) / audio_seconds * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", help="Opus/WebM file or URL to play")
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--encode-processes", type=int, default=2)
+    args = parser.parse_args()
+
+    ensure_opus()
+    with tempfile.TemporaryDirectory() as directory:
+        stream_url = args.input or generate_input(directory, args.seconds)
+        print(f"{args.streams} concurrent stream(s) per mode, input: {stream_url}")
+        print(f"{'mode':<16}{'wall s':>9}{'bot ms/s':>11}{'ffmpeg ms/s':>13}{'total ms/s':>12}")
+        for name in args.modes:
+            result = run_mode(name, stream_url, args.streams, args.encode_processes)
+            print(
+                f"{name:<16}{result['wall_s']:>9.2f}"
+                f"{result['bot_cpu_ms_per_audio_s']:>11.2f}"
+                f"{result['ffmpeg_cpu_ms_per_audio_s']:>13.2f}"
+                f"{result['total_cpu_ms_per_audio_s']:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
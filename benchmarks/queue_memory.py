@@ -0,0 +1,110 @@
+"""
+Memory per queued track and queue operation cost.
+
+Compares the old queue entry (a search result dict plus headers and the
+requesting member) with ``Track``, then times positional edits on a
+``TrackQueue`` of the requested size.
+
+    python -m benchmarks.queue_memory [--tracks 10000]
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Callable
+
+from cogs.tracks import Track, TrackQueue
+
+# yt-dlp sends the same request headers for every video
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-us,en;q=0.5",
+    "Sec-Fetch-Mode": "navigate",
+}
+
+
+def search_result(i: int) -> dict[str, Any]:
+    video_id = f"{i:011d}"
+    return {
+        "id": video_id,
+        "title": f"Synthetic track number {i} (Official Audio)",
+        "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+        "duration": 180 + i % 120,
+        # Real googlevideo URLs are around 1 KB of signed query parameters
+        "stream_url": f"https://rr1---sn-example.googlevideo.com/videoplayback?id={video_id}&"
+        + "x" * 900,
+        "thumbnail": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        "http_headers": dict(HEADERS),
+        "acodec": "opus",
+        "abr": 130.5,
+    }
+
+
+def measure(build: Callable[[], list]) -> tuple[float, list]:
+    """Traced bytes allocated by ``build``, excluding its inputs."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, built
+
+
+def timed(name: str, count: int, fn: Callable[[], Any]) -> None:
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    per_op = (time.perf_counter() - started) / count
+    print(f"  {name:<28}{per_op * 1e6:>10.2f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tracks", type=int, default=10_000)
+    parser.add_argument("--ops", type=int, default=1000, help="repetitions per operation")
+    args = parser.parse_args()
+
+    results = [search_result(i) for i in range(args.tracks)]
+    member = object()  # stands in for the discord.Member the old entries referenced
+
+    old_bytes, old = measure(
+        lambda: deque(
+            {**r, "http_headers": dict(r["http_headers"]), "addedBy": member}
+            for r in results
+        )
+    )
+    new_bytes, new = measure(lambda: [Track.from_info(r, 1234) for r in results])
+    # Stream URLs are shared with the inputs above; count them as part of each entry
+    url_bytes = sum(len(r["stream_url"]) + 49 for r in results)
+
+    print(f"{args.tracks} tracks, bytes per queued track:")
+    print(f"  {'':<12}{'entry':>8}{'+ stream URL':>14}")
+    for name, total in (("dict", old_bytes), ("Track", new_bytes)):
+        per_track = total / args.tracks
+        print(f"  {name:<12}{per_track:>8.0f}{per_track + url_bytes / args.tracks:>14.0f}")
+    del old
+
+    queue = TrackQueue(new)
+    rng = random.Random(1)
+    size = len(queue)
+    print()
+    print(f"TrackQueue operations at {size} tracks:")
+    timed("index (middle)", args.ops, lambda: queue[size // 2])
+    timed("remove + insert (random)", args.ops, lambda: queue.insert(
+        rng.randrange(size), [queue.remove(rng.randrange(size))]
+    ))
+    timed("move (random)", args.ops, lambda: queue.move(rng.randrange(size), rng.randrange(size)))
+    timed("popleft + append", args.ops, lambda: queue.append(queue.popleft()))
+    timed("bulk insert 100 (front)", args.ops, lambda: [
+        queue.insert(0, new[:100]), [queue.popleft() for _ in range(100)]
+    ])
+    timed("shuffle", max(1, args.ops // 100), lambda: queue.shuffle(rng))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,304 @@
 import asyncio
-from collections import deque
-from typing import cast
+import time
 import discord
-from discord import StageChannel, app_commands, VoiceChannel
+from discord import app_commands
 from discord.ext import commands
 from config import get_config
+from services.audio_cache import AudioCache
 from services.bot_service import MusicBot
+from services.metrics import QUEUE_DEPTH_MAX, QUEUED_TRACKS, VOICE_CONNECTIONS
+from services.extraction_controller import ExtractionUnavailable
+from services.extraction_pool import ExtractionBusy, ExtractionError, ExtractionTimeout
+from services.idle_reaper import IdleReaper
+from services.loudness import LoudnessAnalyzer, LoudnessStore
+from services.queue_journal import QueueJournal, session_records
+from services.search_cache import extract_playlist_id, extract_video_id
+from services.encode_pool import EncodePool
+from services.status_dispatcher import StatusDispatcher
+from services.suggestion_index import SuggestionIndex
 from services.youtube_service import YouTubeService
+from .diagnostics import Diagnostics
+from .player import GuildPlayer
+from .tracks import Track
 from .helpers import (
     generate_embed,
     require_voice_client,
     require_member_voice_channel,
     ensure_opus_loaded,
     generate_track_embed,
+    split_queries,
 )
 
 config = get_config()
 
+# Voice channels rejoined at once when restoring sessions after a restart
+RESTORE_CONCURRENCY = 8
+# Largest text file of queries /queue accepts
+QUEUE_FILE_MAX_BYTES = 64 * 1024
+
+
+def _join_lines(lines: list[str], limit: int) -> str:
+    """Lines joined up to ``limit`` characters, counting the ones left out."""
+    text = ""
+    for i, line in enumerate(lines):
+        more = f"\n…and {len(lines) - i} more"
+        if len(text) + len(line) + 1 + len(more) > limit:
+            return text + more
+        text += ("\n" if text else "") + line
+    return text
+
 
 class Audio(commands.Cog):
+    player_class: type[GuildPlayer] = GuildPlayer
+
     def __init__(self, bot: MusicBot) -> None:
         ensure_opus_loaded()
         self.bot = bot
         self.yt_service = YouTubeService()
-        self.audio_queue: deque = deque()
+        self.audio_cache = (
+            AudioCache(config.audio_cache_dir, config.audio_cache_max_mb * 1024 * 1024)
+            if config.audio_cache_dir
+            else None
+        )
+        self.dispatcher = StatusDispatcher(batch_window=config.status_batch_seconds)
+        # Opus mode already encodes in ffmpeg; the pool takes PCM mode's encoding
+        # out of the bot process
+        self.encode_pool = (
+            EncodePool(config.encode_processes, initializer=ensure_opus_loaded)
+            if config.playback_mode == "pcm" and config.encode_processes > 0
+            else None
+        )
+        self.suggestions = SuggestionIndex(
+            config.suggestions_path, config.suggestions_max_videos
+        )
+        self.loudness = (
+            LoudnessAnalyzer(LoudnessStore(config.loudness_path))
+            if config.loudness_normalization
+            else None
+        )
+        self.journal = (
+            QueueJournal(config.queue_journal_path) if config.queue_journal_path else None
+        )
+        # Sessions from before the restart, resumed once the gateway is ready
+        self.journaled = self.journal.load() if self.journal is not None else {}
+        self.journal_task: asyncio.Task | None = None
+        # One timer heap for every guild's idle deadline
+        self.reaper = IdleReaper(self.reap_if_idle)
+        self.players: dict[int, GuildPlayer] = {}
+
+        # Computed when scraped, so they cost nothing between scrapes
+        QUEUED_TRACKS.set_function(
+            lambda: {(): sum(len(p.audio_queue) for p in self.players.values())}
+        )
+        QUEUE_DEPTH_MAX.set_function(
+            lambda: {(): max((len(p.audio_queue) for p in self.players.values()), default=0)}
+        )
+        VOICE_CONNECTIONS.set_function(
+            lambda: {(): sum(p.is_connected() for p in self.players.values())}
+        )
 
-        self.status_channel: discord.TextChannel | None = None
-        self.status_message: discord.Message | None = None
-        self.voice_client: discord.VoiceClient | None = None
-        self.is_playing: bool = False
-        self.leave_timeout_task: asyncio.Task | None = None
+    async def cog_unload(self) -> None:
+        QUEUED_TRACKS.set_function(None)
+        QUEUE_DEPTH_MAX.set_function(None)
+        VOICE_CONNECTIONS.set_function(None)
+        self.reaper.close()
+        if self.journal is not None:
+            if self.journal_task is not None:
+                self.journal_task.cancel()
+            # Exact positions, then stop recording so tearing down keeps the sessions
+            for player in self.players.values():
+                player.checkpoint()
+            await self.journal.close()
+        for guild_id in list(self.players):
+            await self.destroy_player(guild_id)
+        self.dispatcher.close()
+        if self.encode_pool is not None:
+            self.encode_pool.close()
+        self.suggestions.close()
+        if self.loudness is not None:
+            self.loudness.close()
+        self.yt_service.close()
+
+    def get_player(self, guild: discord.Guild) -> GuildPlayer:
+        """Return the guild's player, creating it on first use."""
+        player = self.players.get(guild.id)
+        if player is None:
+            player = self.player_class(
+                self.bot,
+                guild.id,
+                self.yt_service,
+                audio_cache=self.audio_cache,
+                dispatcher=self.dispatcher,
+                encode_pool=self.encode_pool,
+                suggestions=self.suggestions,
+                reaper=self.reaper,
+                loudness=self.loudness,
+                journal=self.journal,
+            )
+            self.players[guild.id] = player
+            # Players that never get connected are dropped too
+            player.update_idle()
+        return player
+
+    async def destroy_player(self, guild_id: int) -> None:
+        """
+        Release everything held for a guild: voice client, sources, queue and
+        the player itself. Every way of leaving ends up here.
+        """
+        self.reaper.cancel(guild_id)
+        player = self.players.pop(guild_id, None)
+        if player is not None:
+            await player.disconnect_from_voice()
+
+    async def reap_if_idle(self, guild_id: int) -> None:
+        """Reaper callback: release the guild if its idle deadline still holds."""
+        player = self.players.get(guild_id)
+        if player is None:
+            return
+        deadline = player.idle_deadline()
+        if deadline > time.monotonic():
+            self.reaper.schedule(guild_id, deadline)
+            return
 
-    async def run_yt_search(self, query: str, interaction: discord.Interaction):
-        result = await self.yt_service.search(query)
-        if result is None:
+        was_connected = player.is_connected()
+        status_channel = player.status_channel
+        await self.destroy_player(guild_id)
+        if was_connected and status_channel:
             embed = generate_embed(
-                title="😵‍💫 No results found",
-                description="No results found for your query, try pasting the youtube link.",
+                title="💨 Left due to inactivity",
+                description="Join a voice channel and use `/summon` to summon the bot.",
             )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return None
-        return result
+            self.dispatcher.notify(status_channel, embed)
 
-    def post_playback_handler(self, error: Exception | None) -> None:
-        if error:
-            print(f"Playback error: {error!r}")
-
-        # Schedule async handling safely
-        loop = self.bot.loop
-        loop.call_soon_threadsafe(lambda: asyncio.create_task(self.play_next_track()))
-
-    async def play_next_track(self) -> None:
-        # If there's something in the queue, play it
-        if len(self.audio_queue) > 0:
-            up_next: dict = self.audio_queue.popleft()
-            bot_vc = self.voice_client
-            if bot_vc is None or not bot_vc.is_connected():
-                # TODO: Handle this
-                return
-            await self.start_playback(bot_vc, up_next)
-        else:
-            self.is_playing = False
+    # ----- Journal -----
 
-    async def start_playback(
-        self,
-        voice_client: discord.VoiceClient,
-        audio_info,
-        interaction: discord.Interaction | None = None,
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        # Fires again after every reconnect; sessions are restored once
+        if self.journal is not None and self.journal_task is None:
+            self.journal_task = asyncio.create_task(self.run_journal())
+
+    async def run_journal(self) -> None:
+        """Restore journaled sessions, then checkpoint positions and compact."""
+        await self.restore_sessions()
+        while True:
+            await asyncio.sleep(config.queue_checkpoint_seconds)
+            for player in list(self.players.values()):
+                player.checkpoint()
+            if self.journal.needs_compaction():
+                await self.journal.compact(self.journal_snapshot)
+
+    def journal_snapshot(self) -> list[list]:
+        records = [record for p in self.players.values() for record in p.journal_snapshot()]
+        # Sessions still waiting to be restored
+        for guild_id, session in self.journaled.items():
+            records.extend(session_records(guild_id, session))
+        return records
+
+    async def restore_sessions(self) -> None:
+        """Rejoin the voice channels of sessions journaled before the restart."""
+        if not self.journaled:
+            return
+        slots = asyncio.Semaphore(RESTORE_CONCURRENCY)
+        results = await asyncio.gather(
+            *(self.restore_session(guild_id, slots) for guild_id in list(self.journaled))
+        )
+        print(f"Restored {sum(results)} of {len(results)} journaled sessions")
+
+    async def restore_session(self, guild_id: int, slots: asyncio.Semaphore) -> bool:
+        async with slots:
+            session = self.journaled.pop(guild_id)
+            if guild_id in self.players:
+                # Someone started a new session first
+                return False
+            guild = self.bot.get_guild(guild_id)
+            channel = guild.get_channel(session.voice_channel_id) if guild else None
+            if not isinstance(channel, discord.VoiceChannel):
+                self.journal.append(["leave", guild_id])
+                return False
+
+            player = self.get_player(guild)
+            try:
+                player.voice_client = await channel.connect()
+            except (discord.DiscordException, asyncio.TimeoutError) as e:
+                print(f"Could not rejoin {channel.name} in {guild.name}: {e!r}")
+                await self.destroy_player(guild_id)
+                return False
+            status_channel = guild.get_channel(session.status_channel_id or 0)
+            if isinstance(status_channel, discord.TextChannel):
+                player.status_channel = status_channel
+
+        track = Track.from_record(session.playing) if session.playing else None
+        queue = [Track.from_record(record) for record in session.queue]
+        await player.restore(track, session.position, queue)
+        return True
+
+    async def send_extraction_failure(
+        self, interaction: discord.Interaction, error: ExtractionError
     ) -> None:
-        self.voice_client = voice_client
+        if isinstance(error, ExtractionUnavailable):
+            embed = generate_embed(
+                title="🛑 YouTube is limiting requests",
+                description="Searches are paused for now, try again in about "
+                f"{max(1, round(error.retry_after))} seconds.",
+            )
+        elif isinstance(error, ExtractionBusy):
+            embed = generate_embed(
+                title="🚦 Too many requests",
+                description="I'm busy looking up other tracks, try again in a moment.",
+            )
+        else:
+            embed = generate_embed(
+                title="⌛ Search timed out",
+                description="YouTube took too long to respond, try again in a moment.",
+            )
+        await interaction.followup.send(embed=embed, ephemeral=True)
 
-        # Prepare headers for FFmpeg
-        headers = audio_info.get("http_headers") or {}
-        headers.setdefault("User-Agent", "Mozilla/5.0")
-        header_lines = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    async def search_track(self, query: str, interaction: discord.Interaction):
+        """
+        Resolve a query for an interaction, None if nothing was found or the
+        interaction already expired. Extraction errors propagate.
+        """
+        # Give up once the interaction token expires, nobody is waiting anymore
+        remaining = (interaction.expires_at - discord.utils.utcnow()).total_seconds()
+        timeout = min(config.extraction_timeout, remaining)
+        if timeout <= 0:
+            return None
 
-        before_options = (
-            "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 "
-            f'-headers "{header_lines}"'
-        )
+        result = await self.yt_service.search(query, timeout=timeout, local_ids=self.audio_cache)
+        if result is not None and interaction.guild_id is not None:
+            self.suggestions.record_query(
+                interaction.guild_id, query, result.get("id"), result.get("title")
+            )
+        return result
 
-        source = discord.FFmpegPCMAudio(
-            audio_info["stream_url"],
-            before_options=before_options,
-            options="-vn",
-        )
+    async def run_yt_search(self, query: str, interaction: discord.Interaction):
+        try:
+            result = await self.search_track(query, interaction)
+        except (ExtractionBusy, ExtractionTimeout, ExtractionUnavailable) as e:
+            await self.send_extraction_failure(interaction, e)
+            return None
 
-        embed = generate_track_embed(audio_info)
-        if interaction:
-            self.status_message = await interaction.followup.send(embed=embed)
-        elif self.status_channel:
-            self.status_message = await self.status_channel.send(embed=embed)
+        if result is None:
+            embed = generate_embed(
+                title="😵‍💫 No results found",
+                description="No results found for your query, try pasting the youtube link.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return None
+        return result
 
-        self.is_playing = True
-        voice_client.play(source, after=self.post_playback_handler)
+    async def query_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> list[app_commands.Choice[str]]:
+        """Suggest tracks resolved before, so picking one skips the search."""
+        if interaction.guild_id is None:
+            return []
+        return [
+            # The short link resolves straight from the search cache by video ID
+            app_commands.Choice(name=title[:100], value=f"https://youtu.be/{video_id}")
+            for video_id, title in self.suggestions.suggest(interaction.guild_id, current)
+        ]
 
     @app_commands.command(
         name="summon", description="Summon the bot to your voice channel"
@@ -131,9 +336,12 @@ class Audio(commands.Cog):
             return
 
         # Otherwise connect
-        self.voice_client = await user_voice_channel.connect()
+        player = self.get_player(user_voice_channel.guild)
+        player.voice_client = await user_voice_channel.connect()
         if isinstance(interaction.channel, discord.TextChannel):
-            self.status_channel = interaction.channel
+            player.status_channel = interaction.channel
+        player.record_voice(joined=True)
+        player.touch()
         embed = generate_embed(
             title=f"🔊 Joined **{user_voice_channel.name}**",
             description="Use `/play` to begin playing audio.",
@@ -142,12 +350,14 @@ class Audio(commands.Cog):
 
     @app_commands.command(name="queue", description="Add audio to the queue")
     @app_commands.describe(
-        query="The title or Youtube URL of the audio you wish to queue",
+        query="The title or Youtube URL of the audio you wish to queue, separate several with ;",
+        file="A text file with one title or Youtube URL per line",
     )
     async def queue(
         self,
         interaction: discord.Interaction,
-        query: str,
+        query: str | None = None,
+        file: discord.Attachment | None = None,
     ) -> None:
         await interaction.response.defer(ephemeral=True)
 
@@ -160,15 +370,105 @@ class Audio(commands.Cog):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
+        queries = split_queries(query or "")
+        if file is not None:
+            if file.size > QUEUE_FILE_MAX_BYTES:
+                embed = generate_embed(
+                    title="❌ File too large",
+                    description=f"Query files are limited to {QUEUE_FILE_MAX_BYTES // 1024} KB.",
+                )
+                await interaction.followup.send(embed=embed, ephemeral=True)
+                return
+            queries += split_queries((await file.read()).decode(errors="replace"))
+        if not queries:
+            embed = generate_embed(
+                title="❌ Nothing to queue",
+                description="Give a title or Youtube URL, or attach a text file of them.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+        if len(queries) > 1:
+            await self.queue_batch(interaction, bot_vc, queries)
+            return
+        query = queries[0]
+
+        # Bare playlist links are listed lazily instead of resolved as one track
+        if extract_playlist_id(query) and not extract_video_id(query):
+            await self.queue_playlist(interaction, bot_vc, query, autoplay=False)
+            return
+
         # Search for the audio
         result = await self.run_yt_search(query, interaction)
         if result is None:
             return
 
-        self.audio_queue.append({**result, "addedBy": interaction.user})
+        player = self.get_player(bot_vc.guild)
+        player.voice_client = bot_vc
+        track = player.track_from(result, interaction.user.id)
+        player.enqueue(track)
+
+        embed = generate_track_embed(track, queue=True)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    queue.autocomplete("query")(query_autocomplete)
+
+    async def queue_batch(
+        self,
+        interaction: discord.Interaction,
+        bot_vc: discord.VoiceClient,
+        queries: list[str],
+    ) -> None:
+        """
+        Resolve several queries at once, at most QUEUE_BATCH_CONCURRENCY at a
+        time, and queue what was found in the order it was asked for, reporting
+        everything in one message.
+        """
+        skipped = len(queries) - config.queue_batch_max
+        queries = queries[: config.queue_batch_max]
+        slots = asyncio.Semaphore(config.queue_batch_concurrency)
+
+        async def resolve(query: str):
+            if extract_playlist_id(query) and not extract_video_id(query):
+                return None, "queue playlists on their own"
+            async with slots:
+                try:
+                    result = await self.search_track(query, interaction)
+                except ExtractionBusy:
+                    return None, "the bot is busy"
+                except ExtractionTimeout:
+                    return None, "timed out"
+                except ExtractionUnavailable:
+                    return None, "YouTube is limiting requests"
+            if result is None:
+                return None, "no results"
+            return result, None
+
+        # gather keeps submission order whatever order the searches finish in
+        results = await asyncio.gather(*(resolve(query) for query in queries))
+
+        player = self.get_player(bot_vc.guild)
+        player.voice_client = bot_vc
+        tracks = []
+        lines = []
+        for query, (result, reason) in zip(queries, results):
+            if result is None:
+                shown = query[:60].replace("`", "'")
+                lines.append(f"❌ `{shown}` — {reason}")
+                continue
+            track = player.track_from(result, interaction.user.id)
+            tracks.append(track)
+            title = (track.title or "Unknown title")[:60]
+            lines.append(f"✅ [{title}]({track.webpage_url})")
+        if tracks:
+            player.enqueue_many(tracks)
+        if skipped > 0:
+            lines.append(f"Skipped {skipped} more, up to {config.queue_batch_max} at once.")
 
-        embed = generate_track_embed(
-            {**result, "addedBy": interaction.user}, queue=True
+        embed = generate_embed(
+            title=f"📥 Queued {len(tracks)} of {len(queries)} tracks"
+            if tracks
+            else "😵‍💫 Nothing queued",
+            description=_join_lines(lines, 4000),
         )
         await interaction.followup.send(embed=embed, ephemeral=True)
 
@@ -197,13 +497,97 @@ class Audio(commands.Cog):
         if result is None:
             return
 
-        print(result)
+        player = self.get_player(bot_vc.guild)
+        player.voice_client = bot_vc
+        if isinstance(interaction.channel, discord.TextChannel):
+            player.status_channel = interaction.channel
+        track = player.track_from(result, interaction.user.id)
+        # Already playing something: queue it rather than cut in
+        if player.is_playing or bot_vc.is_playing() or bot_vc.is_paused():
+            player.enqueue(track)
+            await interaction.followup.send(embed=generate_track_embed(track, queue=True))
+            return
+        await player.start_playback(bot_vc, track, interaction=interaction)
+
+    play.autocomplete("query")(query_autocomplete)
 
+    @app_commands.command(
+        name="playlist", description="Queue every track in a YouTube playlist"
+    )
+    @app_commands.describe(url="The Youtube URL of the playlist you wish to queue")
+    async def playlist(self, interaction: discord.Interaction, url: str) -> None:
+        await interaction.response.defer()
+
+        bot_vc = await require_voice_client(interaction)
+        if bot_vc is None:
+            embed = generate_embed(
+                title="❌ Not in voice channel",
+                description="Join a voice channel and use `/summon` to summon the bot.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if extract_playlist_id(url) is None:
+            embed = generate_embed(
+                title="❌ Not a playlist",
+                description="Paste a YouTube link that contains a `list=` parameter.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        await self.queue_playlist(interaction, bot_vc, url, autoplay=True)
+
+    async def queue_playlist(
+        self,
+        interaction: discord.Interaction,
+        bot_vc: discord.VoiceClient,
+        url: str,
+        autoplay: bool,
+    ) -> None:
+        """
+        Enqueue the first page of a playlist right away and keep listing the
+        rest in the background. Entries are placeholders until they're about
+        to play.
+        """
+        pages = self.yt_service.playlist_pages(
+            url, config.playlist_page_size, config.playlist_max_tracks
+        )
+        try:
+            first_page = await anext(pages, None)
+        except (ExtractionBusy, ExtractionTimeout, ExtractionUnavailable) as e:
+            await self.send_extraction_failure(interaction, e)
+            return
+        except ExtractionError:
+            first_page = None
+        if first_page is None:
+            embed = generate_embed(
+                title="😵‍💫 Playlist not found",
+                description="The playlist is empty, private or could not be loaded.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        title, entries = first_page
+        player = self.get_player(bot_vc.guild)
+        player.voice_client = bot_vc
         if isinstance(interaction.channel, discord.TextChannel):
-            self.status_channel = interaction.channel
-        await self.start_playback(
-            bot_vc, {**result, "addedBy": interaction.user}, interaction=interaction
+            player.status_channel = interaction.channel
+        player.enqueue_many([Track.from_info(e, interaction.user.id) for e in entries])
+        player.spawn(self.ingest_playlist(player, pages, interaction.user.id))
+
+        embed = generate_embed(
+            title="📜 Queued Playlist",
+            description=f"[{title or 'Playlist'}]({url})\n"
+            f"{len(entries)} tracks queued, loading the rest in the background.",
         )
+        await interaction.followup.send(embed=embed, ephemeral=not autoplay)
+
+        if autoplay and not player.is_playing:
+            await player.play_next_track()
+
+    async def ingest_playlist(self, player: GuildPlayer, pages, added_by_id: int) -> None:
+        async for _, entries in pages:
+            player.enqueue_many([Track.from_info(e, added_by_id) for e in entries])
 
     @app_commands.command(name="skip", description="Skip whatever is currently playing")
     async def skip(
@@ -211,7 +595,8 @@ class Audio(commands.Cog):
         interaction: discord.Interaction,
     ) -> None:
         await interaction.response.defer()
-        if not self.is_playing or not self.voice_client:
+        player = self.players.get(interaction.guild_id or 0)
+        if player is None or not player.is_playing or not player.voice_client:
             embed = generate_embed(
                 title="❌ Nothing is playing",
                 description="Use `/play` to begin playing audio.",
@@ -222,31 +607,119 @@ class Audio(commands.Cog):
         embed = generate_embed(title=f"⏭️ Track skipped")
         await interaction.followup.send(embed=embed)
 
-        self.voice_client.stop()
-        await self.play_next_track()
+        # Stopping fires post_playback_handler, which advances the queue
+        player.voice_client.stop()
+
+    async def require_queue_position(
+        self, interaction: discord.Interaction, *positions: int
+    ) -> GuildPlayer | None:
+        """The guild's player if every 1-based position is in its queue."""
+        player = self.players.get(interaction.guild_id or 0)
+        size = len(player.audio_queue) if player is not None else 0
+        if size == 0:
+            embed = generate_embed(
+                title="❌ The queue is empty",
+                description="Use `/queue` to add tracks.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return None
+        if any(position > size for position in positions):
+            embed = generate_embed(
+                title="❌ No track at that position",
+                description=f"The queue has {size} tracks.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return None
+        return player
+
+    @app_commands.command(name="remove", description="Remove a track from the queue")
+    @app_commands.describe(position="Position of the track in the queue, starting at 1")
+    async def remove(
+        self, interaction: discord.Interaction, position: app_commands.Range[int, 1]
+    ) -> None:
+        await interaction.response.defer()
+        player = await self.require_queue_position(interaction, position)
+        if player is None:
+            return
+
+        track = player.remove_track(position - 1)
+        embed = generate_embed(
+            title="🗑️ Removed Track",
+            description=f"[{track.title or 'Track'}]({track.webpage_url})",
+        )
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="move", description="Move a track within the queue")
+    @app_commands.describe(
+        position="Current position of the track, starting at 1",
+        new_position="Position to move the track to",
+    )
+    async def move(
+        self,
+        interaction: discord.Interaction,
+        position: app_commands.Range[int, 1],
+        new_position: app_commands.Range[int, 1],
+    ) -> None:
+        await interaction.response.defer()
+        player = await self.require_queue_position(interaction, position)
+        if player is None:
+            return
+
+        new_position = min(new_position, len(player.audio_queue))
+        track = player.move_track(position - 1, new_position - 1)
+        embed = generate_embed(
+            title="↕️ Moved Track",
+            description=f"[{track.title or 'Track'}]({track.webpage_url}) "
+            f"is now at position {new_position}.",
+        )
+        await interaction.followup.send(embed=embed)
 
-    async def disconnect_from_voice(self) -> None:
-        """Disconnect from voice channel and clean up state."""
-        if self.voice_client is None or not self.voice_client.is_connected():
+    @app_commands.command(name="shuffle", description="Shuffle the queue")
+    async def shuffle(self, interaction: discord.Interaction) -> None:
+        await interaction.response.defer()
+        player = await self.require_queue_position(interaction)
+        if player is None:
             return
 
-        # Stop audio playback gracefully before disconnecting
-        if self.voice_client.is_playing():
-            self.voice_client.stop()
-        await self.voice_client.disconnect()
+        player.shuffle_queue()
+        embed = generate_embed(
+            title="🔀 Queue Shuffled",
+            description=f"{len(player.audio_queue)} tracks in a new order.",
+        )
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="volume", description="Set the playback volume")
+    @app_commands.describe(level="Volume in percent, 100 plays tracks as they are")
+    async def volume(
+        self, interaction: discord.Interaction, level: app_commands.Range[int, 0, 200]
+    ) -> None:
+        await interaction.response.defer()
+
+        player = self.players.get(interaction.guild_id or 0)
+        if player is None or not player.is_connected():
+            embed = generate_embed(
+                title="❌ Not in voice channel",
+                description="Join a voice channel and use `/summon` to summon the bot.",
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
 
-        # Clean up state
-        self.voice_client = None
-        self.is_playing = False
-        self.audio_queue.clear()
-        self.status_message = None
-        self.leave_timeout_task = None
+        applied = player.set_volume(level / 100)
+        embed = generate_embed(title=f"🔊 Volume set to {level}%")
+        if player.is_playing and not applied:
+            embed.description = (
+                "Opus mode encodes the volume into the stream, so the current "
+                "track keeps playing at its old volume. The change applies from "
+                "the next track."
+            )
+        await interaction.followup.send(embed=embed)
 
     @app_commands.command(name="leave", description="Leave the voice channel")
     async def leave(self, interaction: discord.Interaction) -> None:
         await interaction.response.defer()
 
-        if self.voice_client is None or not self.voice_client.is_connected():
+        player = self.players.get(interaction.guild_id or 0)
+        if player is None or not player.is_connected():
             embed = generate_embed(
                 title="❌ Not in voice channel",
                 description="The bot is not currently in a voice channel.",
@@ -254,40 +727,14 @@ class Audio(commands.Cog):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
-        channel_name = self.voice_client.channel.name
-        await self.disconnect_from_voice()
+        channel_name = player.voice_client.channel.name
+        await self.destroy_player(player.guild_id)
         embed = generate_embed(
             title=f"💨 Left **{channel_name}**",
             description="Join a voice channel and use `/summon` to summon the bot.",
         )
         await interaction.followup.send(embed=embed)
 
-    async def check_if_alone(self) -> None:
-        """Check if bot is alone in voice channel and leave after 30 seconds."""
-        if self.voice_client is None or not self.voice_client.is_connected():
-            return
-
-        # Check if bot is the only one in the channel
-        members_in_channel = [m for m in self.voice_client.channel.members if not m.bot]
-
-        if len(members_in_channel) == 0:
-            # No one is in the channel, schedule leaving after 30 seconds
-            await asyncio.sleep(30)
-            if self.voice_client and self.voice_client.is_connected():
-                # Double-check no one has joined in the meantime
-                members_in_channel = [
-                    m for m in self.voice_client.channel.members if not m.bot
-                ]
-                if len(members_in_channel) == 0:
-                    await self.disconnect_from_voice()
-                    # Send inactivity message
-                    if self.status_channel:
-                        embed = generate_embed(
-                            title="💨 Left due to inactivity",
-                            description="Join a voice channel and use `/summon` to summon the bot.",
-                        )
-                        await self.status_channel.send(embed=embed)
-
     @commands.Cog.listener()
     async def on_voice_state_update(
         self,
@@ -295,46 +742,40 @@ class Audio(commands.Cog):
         before: discord.VoiceState,
         after: discord.VoiceState,
     ) -> None:
-        """Handle voice state updates and auto-leave if bot is alone."""
-        if (
-            member.bot
-            or self.voice_client is None
-            or not self.voice_client.is_connected()
-        ):
+        """Track who's listening, for leaving empty channels."""
+        player = self.players.get(member.guild.id)
+        if player is None:
+            return
+
+        if member.id == getattr(self.bot.user, "id", None):
+            # The bot itself was disconnected (kicked, channel deleted, ...)
+            if after.channel is None:
+                await self.destroy_player(player.guild_id)
+            else:
+                player.record_voice()
+                player.update_idle()
+            return
+
+        if member.bot or not player.is_connected():
             return
 
-        if (
-            before.channel == self.voice_client.channel
-            and after.channel != self.voice_client.channel
-        ):
-            # Check if bot is now alone
-            members_in_channel = [
-                m for m in self.voice_client.channel.members if not m.bot
-            ]
-
-            if len(members_in_channel) == 0:
-                # Cancel existing timeout task if any
-                if self.leave_timeout_task and not self.leave_timeout_task.done():
-                    self.leave_timeout_task.cancel()
-
-                # Start new timeout task only if vc is empty
-                self.leave_timeout_task = asyncio.create_task(self.check_if_alone())
-
-        # Check if someone joined the bot's channel
-        elif (
-            before.channel != self.voice_client.channel
-            and after.channel == self.voice_client.channel
-        ):
-            # Cancel the leave timeout if someone rejoins
-            if self.leave_timeout_task and not self.leave_timeout_task.done():
-                self.leave_timeout_task.cancel()
-                self.leave_timeout_task = None
+        bot_channel = player.voice_client.channel
+        if bot_channel in (before.channel, after.channel) and before.channel != after.channel:
+            # Someone left or joined; starts or clears the alone timeout
+            player.update_idle()
 
 
 async def setup(bot: MusicBot) -> None:
-    await bot.add_cog(Audio(bot))
+    audio = Audio(bot)
+    await bot.add_cog(audio)
+    # Registered here so its commands are synced with the audio ones
+    await bot.add_cog(Diagnostics(bot, audio))
+    bot.startup.mark("audio cog")
 
     if config.debug_guild_id:
         guild = discord.Object(id=config.debug_guild_id)
         bot.tree.copy_global_to(guild=guild)
-        await bot.tree.sync(guild=guild)
+        # With several shard processes, one of them syncs for all
+        if bot.is_primary:
+            await bot.sync_commands_if_changed(guild=guild)
+            bot.startup.mark("command sync")
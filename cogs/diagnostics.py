@@ -0,0 +1,172 @@
+import asyncio
+import io
+import json
+import time
+from typing import TYPE_CHECKING, Literal
+import discord
+from discord import app_commands
+from discord.ext import commands
+from services.bot_service import MusicBot
+from services.diagnostics import (
+    MemoryTracer,
+    format_lag,
+    measure_lag,
+    process_counts,
+    profile_loop,
+    sample_loop,
+)
+from .helpers import generate_embed
+
+if TYPE_CHECKING:
+    from .audio import Audio
+
+
+@app_commands.default_permissions(administrator=True)
+class Diagnostics(commands.GroupCog, group_name="debug"):
+    """
+    Owner-only diagnostics of the running process, each returned as a file.
+    Nothing runs between commands, except tracemalloc while it's started.
+    """
+
+    def __init__(self, bot: MusicBot, audio: "Audio") -> None:
+        self.bot = bot
+        self.audio = audio
+        self.memory = MemoryTracer()
+        # One capture at a time, they would measure each other
+        self.capturing = asyncio.Lock()
+
+    async def require_owner(self, interaction: discord.Interaction) -> bool:
+        if await self.bot.is_owner(interaction.user):
+            return True
+        embed = generate_embed(
+            title="❌ Owner only",
+            description="Diagnostics are limited to the bot's owner.",
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return False
+
+    async def send_report(
+        self, interaction: discord.Interaction, title: str, filename: str, text: str
+    ) -> None:
+        report = discord.File(io.BytesIO(text.encode()), filename=filename)
+        await interaction.followup.send(embed=generate_embed(title=title), file=report)
+
+    async def capture(
+        self, interaction: discord.Interaction, coro, title: str, filename: str
+    ) -> None:
+        if self.capturing.locked():
+            coro.close()
+            embed = generate_embed(
+                title="⏳ Capture in progress",
+                description="Wait for the running capture to finish.",
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        async with self.capturing:
+            text = await coro
+        await self.send_report(interaction, title, filename, text)
+
+    @app_commands.command(name="profile", description="Profile the event loop for a while")
+    @app_commands.describe(
+        seconds="How long to capture",
+        mode="cprofile counts every call, sample takes stacks every 5 ms (lower overhead)",
+    )
+    async def profile(
+        self,
+        interaction: discord.Interaction,
+        seconds: app_commands.Range[int, 1, 120] = 10,
+        mode: Literal["cprofile", "sample"] = "sample",
+    ) -> None:
+        if not await self.require_owner(interaction):
+            return
+        if mode == "cprofile":
+            await self.capture(
+                interaction, profile_loop(seconds), f"🔬 Profiled {seconds}s", "profile.txt"
+            )
+        else:
+            await self.capture(
+                interaction,
+                sample_loop(seconds),
+                f"🔬 Sampled {seconds}s (collapsed stacks)",
+                "stacks.folded",
+            )
+
+    @app_commands.command(name="lag", description="Measure event loop lag for a while")
+    @app_commands.describe(seconds="How long to measure")
+    async def lag(
+        self,
+        interaction: discord.Interaction,
+        seconds: app_commands.Range[int, 1, 300] = 30,
+    ) -> None:
+        if not await self.require_owner(interaction):
+            return
+
+        async def run() -> str:
+            return format_lag(await measure_lag(seconds))
+
+        await self.capture(interaction, run(), f"⏱️ Loop lag over {seconds}s", "lag.txt")
+
+    @app_commands.command(name="memory", description="Trace allocations by module")
+    @app_commands.describe(
+        action="start tracing, snapshot (with the change since the last one) or stop"
+    )
+    async def memory(
+        self,
+        interaction: discord.Interaction,
+        action: Literal["start", "snapshot", "stop"] = "snapshot",
+    ) -> None:
+        if not await self.require_owner(interaction):
+            return
+        await interaction.response.defer(ephemeral=True)
+
+        if action == "start":
+            await asyncio.to_thread(self.memory.start)
+            embed = generate_embed(
+                title="🧠 Tracing allocations",
+                description="Use `/debug memory snapshot` to report and `stop` when done; "
+                "tracing slows the bot down until then.",
+            )
+            await interaction.followup.send(embed=embed)
+        elif action == "stop":
+            self.memory.stop()
+            await interaction.followup.send(embed=generate_embed(title="🧠 Tracing stopped"))
+        elif not self.memory.tracing:
+            embed = generate_embed(
+                title="❌ Not tracing",
+                description="Use `/debug memory start` first.",
+            )
+            await interaction.followup.send(embed=embed)
+        else:
+            text = await asyncio.to_thread(self.memory.snapshot)
+            await self.send_report(interaction, "🧠 Memory snapshot", "memory.txt", text)
+
+    @app_commands.command(name="counts", description="Count live players, queues and processes")
+    async def counts(self, interaction: discord.Interaction) -> None:
+        if not await self.require_owner(interaction):
+            return
+        await interaction.response.defer(ephemeral=True)
+
+        audio = self.audio
+        players = list(audio.players.values())
+        counts: dict[str, object] = {
+            "players": len(players),
+            "voice clients": len(self.bot.voice_clients),
+            "playing": sum(p.is_playing for p in players),
+            "queued tracks": sum(len(p.audio_queue) for p in players),
+            "idle timers": len(audio.reaper),
+        }
+        started = time.perf_counter()
+        counts.update(process_counts())
+        counts["heap scan (ms)"] = round((time.perf_counter() - started) * 1000, 1)
+        counts["extraction"] = audio.yt_service.pool.stats()
+        counts["status messages"] = audio.dispatcher.stats()
+        if audio.encode_pool is not None:
+            counts["encode pool"] = audio.encode_pool.stats()
+        if audio.loudness is not None:
+            counts["loudness"] = audio.loudness.stats()
+        if audio.journal is not None:
+            counts["queue journal"] = audio.journal.stats()
+
+        text = json.dumps(counts, indent=2) + "\n"
+        await self.send_report(interaction, "🧮 Live counts", "counts.json", text)
@@ -12,31 +12,39 @@ def generate_embed(title, description="") -> discord.Embed:
     return discord.Embed(title=title, description=description, color=config.embed_color)
 
 
-def generate_track_embed(audio_info, queue: bool = False) -> discord.Embed:
-    """Build the now playing embed from audio info."""
-    cleaned_title = audio_info["title"].split("(")[0].strip()
+def generate_track_embed(track, queue: bool = False) -> discord.Embed:
+    """Build the now playing embed for a track."""
+    cleaned_title = (track.title or "Unknown title").split("(")[0].strip()
     embed = generate_embed(
         title=f"🎵 Now Playing",
-        description=f"[{cleaned_title}]({audio_info["webpage_url"]})",
+        description=f"[{cleaned_title}]({track.webpage_url})",
     )
     if queue:
         embed.title = "➡️ Queued Track"
-    if audio_info.get("thumbnail"):
-        embed.set_thumbnail(url=audio_info["thumbnail"])
-    if audio_info.get("addedBy") and not queue:
+    if track.thumbnail:
+        embed.set_thumbnail(url=track.thumbnail)
+    if track.added_by_id and not queue:
         embed.add_field(
             name="Requested by",
-            value=f"<@{audio_info["addedBy"].id}>",
+            value=f"<@{track.added_by_id}>",
             inline=False,
         )
-    if audio_info.get("duration"):
-        duration_seconds = int(audio_info["duration"])
+    if track.duration:
+        duration_seconds = int(track.duration)
         minutes, seconds = divmod(duration_seconds, 60)
         formatted_duration = f"{minutes}:{seconds:02d}"
         embed.add_field(name="Duration", value=formatted_duration, inline=True)
     return embed
 
 
+def split_queries(text: str) -> list[str]:
+    """Queries separated by semicolons or newlines, without blanks."""
+    queries = []
+    for line in text.splitlines():
+        queries += [query.strip() for query in line.split(";") if query.strip()]
+    return queries
+
+
 async def start_playback(
     self,
     voice_client: discord.VoiceClient,
@@ -133,19 +141,14 @@ async def require_voice_client(
 # ----- Checkers ----
 
 
-def ensure_opus_loaded() -> None:
-    if discord.opus.is_loaded():
-        return
-
-    candidates: list[str] = []
-
+def _opus_candidates():
     # 1) Best effort: ask the system loader
     found = ctypes.util.find_library("opus")
     if found:
-        candidates.append(found)  # may be a name, not a full path
+        yield found  # may be a name, not a full path
 
     # 2) Common macOS locations (Intel + Apple Silicon + MacPorts)
-    candidates += [
+    yield from [
         "/opt/homebrew/lib/libopus.dylib",
         "/usr/local/lib/libopus.dylib",
         "/opt/local/lib/libopus.dylib",
@@ -153,39 +156,70 @@ def ensure_opus_loaded() -> None:
     ]
 
     # 3) If Homebrew is present, ask it where opus lives (NO installing)
-    # Only used to locate the already-installed library.
+    # Only used to locate the already-installed library. Spawning brew is slow,
+    # so it's the last resort.
     try:
         import subprocess
 
         brew_prefix = subprocess.check_output(
             ["brew", "--prefix", "opus"], text=True
         ).strip()
-        candidates.append(os.path.join(brew_prefix, "lib", "libopus.dylib"))
+        yield os.path.join(brew_prefix, "lib", "libopus.dylib")
     except Exception:
         pass
 
+
+def _load_opus(cand: str) -> None:
+    # Sanity check: can the dynamic loader open it?
+    ctypes.CDLL(cand)
+    discord.opus.load_opus(cand)
+
+
+def ensure_opus_loaded() -> None:
+    if discord.opus.is_loaded():
+        return
+
+    # The library that worked last time skips discovery entirely
+    cache_path = config.opus_cache_path
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                _load_opus(f.read().strip())
+            if discord.opus.is_loaded():
+                return
+        except Exception:
+            pass
+
+    tried: list[str] = []
     last_error: Exception | None = None
 
-    for cand in candidates:
+    for cand in _opus_candidates():
         if not cand:
             continue
+        tried.append(cand)
 
         # If it's a full path, require it exists
         if os.path.isabs(cand) and not os.path.exists(cand):
             continue
 
         try:
-            # Sanity check: can the dynamic loader open it?
-            ctypes.CDLL(cand)
-            discord.opus.load_opus(cand)
+            _load_opus(cand)
             if discord.opus.is_loaded():
                 print(f"✅ Opus loaded: {cand}")
-                return
+                break
         except Exception as e:
             last_error = e
+    else:
+        raise RuntimeError(
+            "Could not load Opus (libopus). Tried:\n  - "
+            + "\n  - ".join(tried)
+            + (f"\nLast error: {last_error}" if last_error else "")
+        )
 
-    raise RuntimeError(
-        "Could not load Opus (libopus). Tried:\n  - "
-        + "\n  - ".join(candidates)
-        + (f"\nLast error: {last_error}" if last_error else "")
-    )
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with open(cache_path, "w") as f:
+                f.write(cand)
+        except OSError as e:
+            print(f"Could not cache Opus path: {e}")
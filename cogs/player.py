@@ -0,0 +1,693 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable
+import discord
+from config import MIN_OPUS_BITRATE, get_config
+from services.audio_cache import AudioCache
+from services.encode_pool import EncodedAudio, EncodePool
+from services.bot_service import MusicBot
+from services.extraction_pool import ExtractionError
+from services.idle_reaper import IdleReaper
+from services.loudness import LoudnessAnalyzer, gain_db
+from services.queue_journal import QueueJournal
+from services.metrics import (
+    AUDIO_UNDERRUN_SECONDS,
+    AUDIO_UNDERRUNS,
+    FFMPEG_SPAWN_SECONDS,
+    FIRST_FRAME_SECONDS,
+    TRACK_GAP_SECONDS,
+)
+from services.status_dispatcher import StatusDispatcher
+from services.suggestion_index import SuggestionIndex
+from services.youtube_service import YouTubeService
+from .helpers import generate_embed, generate_track_embed
+from .sources import (
+    BufferedAudio,
+    CachedOpusAudio,
+    FirstFrameTimer,
+    PlaybackProgress,
+    RecordingAudio,
+    can_passthrough,
+    create_ffmpeg_source,
+    early_end_margin,
+)
+from .tracks import Track, TrackQueue
+
+config = get_config()
+
+# Normalization gains smaller than this are skipped, keeping Opus passthrough
+GAIN_TOLERANCE_DB = 1.0
+
+
+def record_underrun(stalled: float) -> None:
+    AUDIO_UNDERRUNS.inc()
+    AUDIO_UNDERRUN_SECONDS.inc(stalled)
+
+
+class GuildPlayer:
+    """Playback state for a single guild's voice session."""
+
+    def __init__(
+        self,
+        bot: MusicBot,
+        guild_id: int,
+        yt_service: YouTubeService,
+        audio_cache: AudioCache | None = None,
+        dispatcher: StatusDispatcher | None = None,
+        encode_pool: EncodePool | None = None,
+        suggestions: SuggestionIndex | None = None,
+        reaper: IdleReaper | None = None,
+        loudness: LoudnessAnalyzer | None = None,
+        journal: QueueJournal | None = None,
+    ) -> None:
+        self.bot = bot
+        self.guild_id = guild_id
+        self.yt_service = yt_service
+        self.audio_cache = audio_cache
+        self.dispatcher = dispatcher
+        self.encode_pool = encode_pool
+        self.suggestions = suggestions
+        self.reaper = reaper
+        self.loudness = loudness
+        self.journal = journal
+        self.audio_queue = TrackQueue()
+
+        self.status_channel: discord.TextChannel | None = None
+        self.voice_client: discord.VoiceClient | None = None
+        self.is_playing: bool = False
+        self.now_playing: Track | None = None
+        self._now_playing_started_at: float = 0.0
+        # Set on teardown; the last track's after-callback must not revive the player
+        self.destroyed: bool = False
+        # Linear playback volume, and what adjusts it on the playing source
+        # without restarting ffmpeg (None when it only applies from the next track)
+        self.volume: float = 1.0
+        self._volume_control: discord.PCMVolumeTransformer | EncodedAudio | None = None
+        # Background work owned by this player, e.g. playlist ingestion
+        self.tasks: set[asyncio.Task] = set()
+
+        # Look-ahead state for the head of the queue
+        self.lookahead_task: asyncio.Task | None = None
+        self.prepared: tuple[Track, discord.AudioSource] | None = None
+        self._preparing: Track | None = None
+
+        # Seconds of silence between the end of one track and the start of the next
+        self.track_gaps: deque[float] = deque(maxlen=100)
+        self._track_ended_at: float | None = None
+        # Last track whose stream was re-resolved after dying, retried only once
+        self._retried: Track | None = None
+
+        # Idle tracking (monotonic times) for the reaper
+        self.last_active = time.monotonic()
+        self.alone_since: float | None = None
+
+    def target_bitrate(self) -> int | None:
+        """Bitrate (kbps) to pick streams for: the guild's override or the channel's."""
+        override = config.guild_bitrates.get(self.guild_id)
+        if override:
+            return override
+        if self.voice_client is not None:
+            return self.voice_client.channel.bitrate // 1000
+        return None
+
+    def track_from(self, info, added_by_id: int | None = None) -> Track:
+        return Track.from_info(info, added_by_id, self.target_bitrate())
+
+    def is_connected(self) -> bool:
+        return self.voice_client is not None and self.voice_client.is_connected()
+
+    def listeners(self) -> list[discord.Member]:
+        """Non-bot members in the player's voice channel."""
+        if self.voice_client is None:
+            return []
+        return [m for m in self.voice_client.channel.members if not m.bot]
+
+    def enqueue(self, track: Track) -> None:
+        self.audio_queue.append(track)
+        self.record("add", [track.to_record()])
+        self.queue_changed()
+
+    def enqueue_many(self, tracks: list[Track]) -> None:
+        self.audio_queue.extend(tracks)
+        self.record("add", [track.to_record() for track in tracks])
+        self.queue_changed()
+
+    def remove_track(self, index: int) -> Track:
+        track = self.audio_queue.remove(index)
+        self.record("remove", index)
+        self.queue_changed()
+        return track
+
+    def move_track(self, source: int, destination: int) -> Track:
+        track = self.audio_queue.move(source, destination)
+        self.record("move", source, destination)
+        self.queue_changed()
+        return track
+
+    def shuffle_queue(self) -> None:
+        self.audio_queue.shuffle()
+        self.record("queue", [track.to_record() for track in self.audio_queue])
+        self.queue_changed()
+
+    def queue_changed(self) -> None:
+        if not self.is_playing:
+            return
+        self.schedule_lookahead()
+        # Bursts of queue edits collapse into one edit of the status message
+        if self.dispatcher is not None and self.status_channel is not None:
+            self.dispatcher.update_status(self.status_channel, self.render_status)
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Run a task that is cancelled when the player disconnects."""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def post_playback_handler(
+        self,
+        error: Exception | None,
+        track: Track | None = None,
+        progress: PlaybackProgress | None = None,
+    ) -> None:
+        if self.destroyed:
+            return
+        if error:
+            print(f"Playback error: {error!r}")
+        self._track_ended_at = time.perf_counter()
+
+        # Schedule async handling safely
+        loop = self.bot.loop
+        loop.call_soon_threadsafe(
+            lambda: asyncio.create_task(self.handle_track_end(track, progress, error))
+        )
+
+    def ended_early(
+        self, track: Track, progress: PlaybackProgress | None, error: Exception | None
+    ) -> bool:
+        """
+        True if the stream died (a 403 on an expired URL, a dropped connection)
+        rather than finishing or being stopped by a skip.
+        """
+        if progress is None or not (progress.reached_end or error):
+            return False
+        if track.duration:
+            return progress.seconds < track.duration - early_end_margin(track.duration)
+        return progress.frames == 0
+
+    async def handle_track_end(
+        self,
+        track: Track | None,
+        progress: PlaybackProgress | None,
+        error: Exception | None,
+    ) -> None:
+        # Torn down between the track ending and this running
+        if self.destroyed:
+            return
+        if (
+            track is not None
+            and track is not self._retried
+            and self.ended_early(track, progress, error)
+        ):
+            self._retried = track
+            position = progress.seconds if progress is not None else 0.0
+            print(f"Stream ended early at {position:.0f}s, retrying: {track.webpage_url}")
+            if await self.resume_track(track, position):
+                return
+        await self.play_next_track()
+
+    async def resume_track(self, track: Track, position: float) -> bool:
+        """Re-resolve a track's stream and continue playing it from ``position``."""
+        bot_vc = self.voice_client
+        if bot_vc is None or not bot_vc.is_connected():
+            return False
+        if not await self.refresh_stream(track):
+            return False
+        source = self.read_ahead(self.build_source(track, start=position))
+        await self.start_playback(
+            bot_vc, track, source=source, resume_at=position, announce=False
+        )
+        return True
+
+    async def play_next_track(self) -> None:
+        # If there's something in the queue, play it
+        while len(self.audio_queue) > 0:
+            bot_vc = self.voice_client
+            if bot_vc is None or not bot_vc.is_connected():
+                # Keep the queue, the idle check cleans up a lost connection
+                break
+            up_next = self.audio_queue.popleft()
+            self.record("pop")
+            source = await self.take_prepared(up_next) or await self.open_source(
+                up_next
+            )
+            if source is None:
+                # Placeholder that no longer resolves (removed, region locked, ...)
+                print(f"Skipping unplayable track: {up_next.webpage_url}")
+                continue
+            await self.start_playback(bot_vc, up_next, source=source)
+            return
+
+        self.is_playing = False
+        self.now_playing = None
+        self._volume_control = None
+        self.record("stop")
+        self.touch()
+
+    # ----- Journal -----
+
+    def record(self, op: str, *args) -> None:
+        """Append a change to this guild's session to the queue journal."""
+        if self.journal is not None:
+            self.journal.append([op, self.guild_id, *args])
+
+    def record_voice(self, joined: bool = False) -> None:
+        """Journal the voice and status channels, ``joined`` starting a new session."""
+        if self.voice_client is None:
+            return
+        status_id = self.status_channel.id if self.status_channel is not None else None
+        self.record("join" if joined else "voice", self.voice_client.channel.id, status_id)
+
+    def position(self) -> float:
+        """Seconds into the current track."""
+        return time.perf_counter() - self._now_playing_started_at
+
+    def checkpoint(self) -> None:
+        if self.is_playing and self.now_playing is not None:
+            self.record("pos", round(self.position(), 1))
+
+    def journal_snapshot(self) -> list[list]:
+        """Records that rebuild this session from nothing, for compaction."""
+        if self.voice_client is None:
+            return []
+        status_id = self.status_channel.id if self.status_channel is not None else None
+        records = [
+            ["join", self.guild_id, self.voice_client.channel.id, status_id],
+            ["queue", self.guild_id, [track.to_record() for track in self.audio_queue]],
+        ]
+        if self.is_playing and self.now_playing is not None:
+            records.append(
+                ["play", self.guild_id, self.now_playing.to_record(), round(self.position(), 1)]
+            )
+        return records
+
+    async def restore(self, track: Track | None, position: float, queue: list[Track]) -> None:
+        """
+        Pick up a journaled session on a fresh voice connection: refill the
+        queue (already journaled) and resume ``track`` near ``position``. Only
+        the track that plays is re-resolved; the rest stay placeholders.
+        """
+        self.audio_queue.extend(queue)
+        if track is not None and await self.resume_track(track, position):
+            return
+        await self.play_next_track()
+
+    # ----- Idle -----
+
+    def touch(self) -> None:
+        """Note activity and reschedule the idle check."""
+        if self.destroyed:
+            return
+        self.last_active = time.monotonic()
+        self.update_idle()
+
+    def idle_deadline(self) -> float:
+        """
+        When this player should be released if nothing changes: after
+        ALONE_TIMEOUT with nobody listening, after IDLE_TIMEOUT with nothing
+        playing or no voice connection at all. Busy players are checked again
+        after IDLE_TIMEOUT, which catches anything stuck.
+        """
+        now = time.monotonic()
+        recheck = now + config.idle_timeout
+        if not self.is_connected():
+            return min(recheck, self.last_active + config.idle_timeout)
+        if not self.listeners():
+            if self.alone_since is None:
+                self.alone_since = now
+            return self.alone_since + config.alone_timeout
+        self.alone_since = None
+        vc = self.voice_client
+        if vc.is_playing() or vc.is_paused():
+            return recheck
+        return min(recheck, self.last_active + config.idle_timeout)
+
+    def update_idle(self) -> None:
+        if self.reaper is not None and not self.destroyed:
+            self.reaper.schedule(self.guild_id, self.idle_deadline())
+
+    # ----- Sources -----
+
+    def normalization_gain(self, track: Track) -> float:
+        """Linear gain that levels ``track``, 1.0 until it has been measured."""
+        if self.loudness is None or not track.id:
+            return 1.0
+        measured = self.loudness.store.get(track.id)
+        if measured is None:
+            return 1.0
+        gain = gain_db(measured, config.loudness_target, config.loudness_max_true_peak)
+        if abs(gain) < GAIN_TOLERANCE_DB:
+            return 1.0
+        return 10 ** (gain / 20)
+
+    def loudness_meter(self, track: Track) -> Callable[[str], None] | None:
+        """Measure a video that has no loudness yet from its first full play, for the next one."""
+        if self.loudness is None or not track.id or not track.duration:
+            return None
+        return self.loudness.meter(track.id, track.duration - early_end_margin(track.duration))
+
+    @staticmethod
+    def stream_headers(track: Track) -> dict[str, str]:
+        # Prepare headers for FFmpeg (the track's dict may be shared)
+        headers = dict(track.http_headers or {})
+        headers.setdefault("User-Agent", "Mozilla/5.0")
+        return headers
+
+    def build_source(self, track: Track, start: float = 0.0) -> discord.AudioSource:
+        gain = self.normalization_gain(track)
+        if config.playback_mode == "opus":
+            # Nothing to scale after ffmpeg, so the volume is fixed per track
+            gain *= self.volume
+        return create_ffmpeg_source(
+            track.stream_url,
+            mode=config.playback_mode,
+            headers=self.stream_headers(track),
+            passthrough=can_passthrough(track, config.passthrough_max_bitrate),
+            # No point encoding above what the channel will carry, nor below
+            # what the Opus encoder accepts (8 kbps channels exist)
+            bitrate=max(
+                MIN_OPUS_BITRATE,
+                min(config.opus_bitrate, self.target_bitrate() or config.opus_bitrate),
+            ),
+            start=start,
+            gain=gain,
+            volume=self.volume,
+            encode_pool=self.encode_pool,
+            on_loudness_log=self.loudness_meter(track) if start == 0 else None,
+        )
+
+    def read_ahead(self, source: discord.AudioSource) -> discord.AudioSource:
+        """Buffer a stream's frames ahead of the player (disabled by READAHEAD_FRAMES=0)."""
+        if config.readahead_frames <= 0:
+            return source
+        return BufferedAudio(source, config.readahead_frames, on_underrun=record_underrun)
+
+    def should_record(self, track: Track, source: discord.AudioSource) -> bool:
+        """
+        Cache a track's audio on its first full play if it's Opus and not too
+        long. The recording keeps any normalization gain, so with normalization
+        on, tracks are only recorded once measured and never at another volume.
+        """
+        duration = track.duration
+        return (
+            self.audio_cache is not None
+            and bool(track.id)
+            and config.playback_mode == "opus"
+            and bool(duration)
+            and duration <= config.audio_cache_max_track_seconds
+            and self.volume == 1.0
+            and (self.loudness is None or self.loudness.store.get(track.id) is not None)
+        )
+
+    async def open_source(self, track: Track) -> discord.AudioSource | None:
+        """
+        Open the cheapest source for a track: the local audio cache if it has
+        the video, otherwise ffmpeg on a (refreshed if needed) stream URL.
+        Returns None if the track can't be played.
+        """
+        # Cached audio can't be rescaled
+        if self.audio_cache is not None and track.id and self.volume == 1.0:
+            file = self.audio_cache.open(track.id)
+            if file is not None:
+                return CachedOpusAudio(file)
+
+        if not await self.ensure_fresh_stream(track):
+            return None
+        spawn_started = time.perf_counter()
+        source = self.build_source(track)
+        FFMPEG_SPAWN_SECONDS.observe(time.perf_counter() - spawn_started)
+        if self.should_record(track, source):
+            source = RecordingAudio(source, self.audio_cache, track.id, track.duration)
+        # Outermost, so cache writes happen on the read-ahead thread too
+        return self.read_ahead(source)
+
+    def stream_needs_refresh(self, track: Track) -> bool:
+        """True if the stream URL is missing or expires before the track could finish."""
+        if not track.stream_url:
+            return True
+        if track.expires_at is None:
+            return False
+        needed = (track.duration or 0) + config.stream_refresh_margin
+        return track.expires_at - time.time() < needed
+
+    async def ensure_fresh_stream(self, track: Track) -> bool:
+        """Re-resolve the track's stream URL if it's missing or near expiry."""
+        if not self.stream_needs_refresh(track):
+            return True
+        # A URL close to expiry may still outlast a failed refresh
+        return await self.refresh_stream(track) or bool(track.stream_url)
+
+    async def refresh_stream(self, track: Track) -> bool:
+        """Re-resolve the track's stream URL in place."""
+        try:
+            fresh = await self.yt_service.refresh(track.webpage_url)
+        except ExtractionError as e:
+            print(f"Stream refresh failed: {e}")
+            return False
+        if fresh is None or not fresh.get("stream_url"):
+            return False
+        track.update_stream(fresh, self.target_bitrate())
+        return True
+
+    # ----- Look-ahead -----
+
+    def schedule_lookahead(self) -> None:
+        """Prepare the head of the queue shortly before the current track ends."""
+        if self.prepared is not None:
+            if self.audio_queue and self.prepared[0] is self.audio_queue[0]:
+                return
+            # The queue changed since the source was prepared
+            self.discard_prepared()
+        if not self.audio_queue:
+            return
+        if self.lookahead_task is not None and not self.lookahead_task.done():
+            return
+        self.lookahead_task = asyncio.create_task(self._lookahead())
+
+    async def _lookahead(self) -> None:
+        current = self.now_playing
+        started_at = self._now_playing_started_at
+        if current and current.duration:
+            elapsed = time.perf_counter() - started_at
+            delay = current.duration - elapsed - config.lookahead_seconds
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if not self.audio_queue:
+            return
+        up_next = self.audio_queue[0]
+        self._preparing = up_next
+        try:
+            opened = await self.open_source(up_next)
+            if opened is None:
+                return
+            source = opened
+            if isinstance(source, BufferedAudio):
+                # Spend ffmpeg's connect and probe time before the handoff
+                try:
+                    await asyncio.to_thread(source.prefill, config.prebuffer_frames)
+                except asyncio.CancelledError:
+                    source.cleanup()
+                    raise
+        finally:
+            self._preparing = None
+
+        # take_prepared checks the source still matches the track being played
+        self.prepared = (up_next, source)
+
+    async def take_prepared(self, track: Track) -> discord.AudioSource | None:
+        """Return the pre-buffered source for ``track`` if one is ready."""
+        task = self.lookahead_task
+        if task is not None and not task.done():
+            if self._preparing is track:
+                # Already resolving or buffering this track, finishing is quickest
+                await asyncio.wait([task])
+            else:
+                task.cancel()
+        self.lookahead_task = None
+
+        prepared, self.prepared = self.prepared, None
+        if prepared is None:
+            return None
+        prepared_track, source = prepared
+        if prepared_track is track:
+            return source
+        source.cleanup()
+        return None
+
+    def discard_prepared(self) -> None:
+        if self.lookahead_task is not None and not self.lookahead_task.done():
+            self.lookahead_task.cancel()
+        self.lookahead_task = None
+        if self.prepared is not None:
+            self.prepared[1].cleanup()
+            self.prepared = None
+
+    # ----- Playback -----
+
+    async def start_playback(
+        self,
+        voice_client: discord.VoiceClient,
+        track: Track,
+        interaction: discord.Interaction | None = None,
+        source: discord.AudioSource | None = None,
+        resume_at: float = 0.0,
+        announce: bool = True,
+    ) -> None:
+        self.voice_client = voice_client
+
+        if source is None:
+            source = await self.open_source(track)
+        if source is None:
+            print(f"Could not open a source for {track.webpage_url}")
+            if interaction:
+                embed = generate_embed(
+                    title="😵‍💫 Could not play track",
+                    description="The stream could not be loaded, try again in a moment.",
+                )
+                await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        previous_control = self._volume_control
+        source = self.attach_volume(source)
+        progress = PlaybackProgress(source)
+        try:
+            voice_client.play(
+                FirstFrameTimer(progress, FIRST_FRAME_SECONDS.observe),
+                after=lambda error: self.post_playback_handler(error, track, progress),
+            )
+        except discord.ClientException as e:
+            # Already playing or disconnected; nothing changed, so only the source goes
+            print(f"Could not start {track.webpage_url}: {e}")
+            self._volume_control = previous_control
+            source.cleanup()
+            if interaction:
+                embed = generate_embed(
+                    title="😵‍💫 Could not play track",
+                    description="Something else is playing, use `/queue` to add it.",
+                )
+                await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        self.is_playing = True
+        self.now_playing = track
+        self._now_playing_started_at = time.perf_counter() - resume_at
+        self.record("play", track.to_record(), round(resume_at, 1))
+
+        if self._track_ended_at is not None:
+            gap = self._now_playing_started_at - self._track_ended_at
+            self.track_gaps.append(gap)
+            TRACK_GAP_SECONDS.observe(gap)
+            self._track_ended_at = None
+        self.schedule_lookahead()
+        self.touch()
+        if not announce:
+            return
+        if self.suggestions is not None:
+            self.suggestions.record_play(self.guild_id, track.id, track.title)
+
+        # Announce after the handoff so the message round trip isn't part of the gap
+        if interaction:
+            message = await interaction.followup.send(embed=self.render_status())
+            if self.dispatcher is not None and interaction.channel == self.status_channel:
+                self.dispatcher.adopt(self.status_channel, message)
+        elif self.status_channel:
+            if self.dispatcher is not None:
+                self.dispatcher.update_status(
+                    self.status_channel, self.render_status, repost=True
+                )
+            else:
+                await self.status_channel.send(embed=self.render_status())
+
+    # ----- Volume -----
+
+    def attach_volume(self, source: discord.AudioSource) -> discord.AudioSource:
+        """Find or add the volume control of a source that's about to play."""
+        if not source.is_opus():
+            self._volume_control = discord.PCMVolumeTransformer(source, self.volume)
+            return self._volume_control
+        # Encode pool streams take volume changes in the worker
+        self._volume_control = None
+        inner = source
+        while inner is not None:
+            if isinstance(inner, EncodedAudio):
+                # It may have been prepared before a volume change
+                inner.volume = self.volume
+                self._volume_control = inner
+                break
+            inner = getattr(inner, "source", None)
+        return source
+
+    def set_volume(self, volume: float) -> bool:
+        """
+        Set the playback volume (1.0 = as is). Returns False if the current
+        track can't be rescaled while it plays and the change only applies
+        from the next one.
+        """
+        self.volume = volume
+        if config.playback_mode == "opus":
+            # The next track was encoded at the old volume, open it again
+            self.discard_prepared()
+            if self.is_playing:
+                self.schedule_lookahead()
+        if self._volume_control is None:
+            return False
+        self._volume_control.volume = volume
+        return True
+
+    def render_status(self) -> discord.Embed | None:
+        """The now playing embed, with what's up next."""
+        if self.now_playing is None:
+            return None
+        embed = generate_track_embed(self.now_playing)
+        if self.audio_queue:
+            up_next = self.audio_queue[0].title or "Unknown title"
+            if len(self.audio_queue) > 1:
+                up_next += f"\nand {len(self.audio_queue) - 1} more"
+            embed.add_field(name="Up next", value=up_next, inline=False)
+        return embed
+
+    def gap_stats(self) -> dict[str, float]:
+        """Summary of recent between-track gaps, in seconds."""
+        if not self.track_gaps:
+            return {"count": 0, "last": 0.0, "avg": 0.0, "max": 0.0}
+        return {
+            "count": len(self.track_gaps),
+            "last": self.track_gaps[-1],
+            "avg": sum(self.track_gaps) / len(self.track_gaps),
+            "max": max(self.track_gaps),
+        }
+
+    async def disconnect_from_voice(self) -> None:
+        """Disconnect from voice channel and clean up state."""
+        self.destroyed = True
+        for task in list(self.tasks):
+            if task is not asyncio.current_task():
+                task.cancel()
+        self.audio_queue.clear()
+        self.discard_prepared()
+        if self.voice_client is not None and self.voice_client.is_connected():
+            # Stop audio playback gracefully before disconnecting
+            if self.voice_client.is_playing():
+                self.voice_client.stop()
+            await self.voice_client.disconnect()
+
+        # Clean up state
+        self.voice_client = None
+        self.is_playing = False
+        self.now_playing = None
+        self._volume_control = None
+        self.record("leave")
+        if self.dispatcher is not None and self.status_channel is not None:
+            self.dispatcher.forget(self.status_channel)
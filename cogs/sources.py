@@ -0,0 +1,412 @@
+import os
+import shlex
+import threading
+import time
+from typing import BinaryIO, Callable
+import discord
+from services.audio_cache import AudioCache, iter_packets, write_header, write_packet
+from services.encode_pool import EncodePool, read_log_tail
+
+
+# A stream that stops short of the track's duration by more than this many
+# seconds (or this fraction of a short track) died early
+EARLY_END_MARGIN = 5.0
+EARLY_END_RATIO = 0.05
+
+# Largest frame a source can return: 20 ms of 48 kHz stereo PCM, or one Opus
+# packet (1275 bytes per RFC 6716; larger multi-frame packets are kept aside)
+PCM_FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE
+OPUS_MAX_PACKET = 1275
+
+
+def early_end_margin(duration: float) -> float:
+    """Seconds a stream of ``duration`` may fall short and still count as finished."""
+    return min(EARLY_END_MARGIN, duration * EARLY_END_RATIO)
+
+
+class BufferedAudio(discord.AudioSource):
+    """
+    Reads a source ahead on a background thread into a ring of ``depth``
+    preallocated frame slots, so upstream stalls shorter than the buffered
+    audio never reach the player thread. Memory per stream is fixed at
+    ``depth`` slots of the largest frame the source can produce.
+
+    When the ring runs dry mid-stream the player waits for the reader, as it
+    would have without the buffer; each such wait is counted as an underrun
+    and reported to ``on_underrun`` with its length in seconds.
+    """
+
+    def __init__(
+        self,
+        source: discord.AudioSource,
+        depth: int,
+        on_underrun: Callable[[float], None] | None = None,
+    ) -> None:
+        self.source = source
+        self.depth = max(1, depth)
+        self.on_underrun = on_underrun
+        self._slot = OPUS_MAX_PACKET if source.is_opus() else PCM_FRAME_SIZE
+        self._ring = bytearray(self._slot * self.depth)
+        self._lengths = [0] * self.depth
+        self._oversized: dict[int, bytes] = {}
+        self._head = 0  # next slot to play
+        self._count = 0  # filled slots
+        self._started = False
+        self._ended = False
+        self._closed = False
+        self._error: Exception | None = None
+        self._cond = threading.Condition()
+        self.underruns = 0
+        self.underrun_seconds = 0.0
+        self._reader = threading.Thread(
+            target=self._fill, name="audio-read-ahead", daemon=True
+        )
+        self._reader.start()
+
+    @property
+    def buffered(self) -> int:
+        """Frames currently waiting in the ring."""
+        return self._count
+
+    def _fill(self) -> None:
+        while True:
+            with self._cond:
+                while self._count >= self.depth and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Outside the lock: this is the read that may stall on the network
+            try:
+                data = self.source.read()
+            except Exception as e:
+                with self._cond:
+                    if not self._closed:
+                        self._error = e
+                    self._ended = True
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                if self._closed:
+                    return
+                if not data:
+                    self._ended = True
+                    self._cond.notify_all()
+                    return
+                index = (self._head + self._count) % self.depth
+                if len(data) > self._slot:
+                    self._oversized[index] = data
+                else:
+                    offset = index * self._slot
+                    self._ring[offset : offset + len(data)] = data
+                self._lengths[index] = len(data)
+                self._count += 1
+                self._cond.notify_all()
+
+    def prefill(self, frames: int) -> None:
+        """Blocking; wait until ``frames`` frames are buffered or the source ended."""
+        frames = min(frames, self.depth)
+        with self._cond:
+            while self._count < frames and not self._ended and not self._closed:
+                self._cond.wait()
+
+    def read(self) -> bytes:
+        with self._cond:
+            if self._count == 0 and not self._ended and not self._closed:
+                stalled_at = time.perf_counter()
+                while self._count == 0 and not self._ended and not self._closed:
+                    self._cond.wait()
+                # Waiting for the very first frame is startup, not an underrun
+                if self._started:
+                    stalled = time.perf_counter() - stalled_at
+                    self.underruns += 1
+                    self.underrun_seconds += stalled
+                    if self.on_underrun is not None:
+                        self.on_underrun(stalled)
+            if self._count == 0:
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                return b""
+
+            index = self._head
+            data = self._oversized.pop(index, None)
+            if data is None:
+                offset = index * self._slot
+                data = bytes(self._ring[offset : offset + self._lengths[index]])
+            self._head = (index + 1) % self.depth
+            self._count -= 1
+            self._started = True
+            self._cond.notify_all()
+            return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._count = 0
+            self._oversized.clear()
+            self._cond.notify_all()
+        # Kills ffmpeg, so a reader stuck in read() returns and exits. Not
+        # joined: this may run on the event loop (discarding a prepared track)
+        self.source.cleanup()
+
+
+class FirstFrameTimer(discord.AudioSource):
+    """Reports the time from creation until the first frame is read."""
+
+    def __init__(
+        self, source: discord.AudioSource, on_first_frame: Callable[[float], None]
+    ) -> None:
+        self.source = source
+        self.on_first_frame: Callable[[float], None] | None = on_first_frame
+        self.started_at = time.perf_counter()
+
+    def read(self) -> bytes:
+        data = self.source.read()
+        if self.on_first_frame is not None and data:
+            self.on_first_frame(time.perf_counter() - self.started_at)
+            self.on_first_frame = None
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self) -> None:
+        self.source.cleanup()
+
+
+class PlaybackProgress(discord.AudioSource):
+    """
+    Counts the frames read from a source and whether it ran out on its own,
+    as opposed to being stopped by a skip or disconnect.
+    """
+
+    def __init__(self, source: discord.AudioSource) -> None:
+        self.source = source
+        self.frames = 0
+        self.reached_end = False
+
+    @property
+    def seconds(self) -> float:
+        return self.frames * 0.02
+
+    def read(self) -> bytes:
+        data = self.source.read()
+        if data:
+            self.frames += 1
+        else:
+            self.reached_end = True
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self) -> None:
+        self.source.cleanup()
+
+
+class CachedOpusAudio(discord.AudioSource):
+    """Plays Opus packets straight from an audio cache entry."""
+
+    def __init__(self, file: BinaryIO) -> None:
+        self.file = file
+        self._packets = iter_packets(file)
+
+    def read(self) -> bytes:
+        return next(self._packets, b"")
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self.file.close()
+
+
+class RecordingAudio(discord.AudioSource):
+    """
+    Tees the Opus packets of a source into the audio cache. The entry is only
+    committed if the source reached its natural end before being cleaned up,
+    with no more missing than a stream that ended early would; skips, errors
+    and early EOFs discard it.
+    """
+
+    def __init__(
+        self,
+        source: discord.AudioSource,
+        cache: AudioCache,
+        video_id: str,
+        duration: float | None,
+    ) -> None:
+        self.source = source
+        self.cache = cache
+        self.video_id = video_id
+        self.duration = duration
+        self.temp_path = cache.temp_path(video_id)
+        self._file: BinaryIO | None = open(self.temp_path, "wb")
+        write_header(self._file)
+        self._packets = 0
+        self._finished = False
+
+    def read(self) -> bytes:
+        data = self.source.read()
+        if self._file is None:
+            return data
+        if data:
+            try:
+                write_packet(self._file, data)
+                self._packets += 1
+            except (OSError, ValueError) as e:
+                # ValueError: the file was closed by a concurrent cleanup
+                print(f"Audio cache write failed: {e!r}")
+                self._discard()
+        else:
+            self._finished = True
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def _complete(self, reached_end: bool) -> bool:
+        if not reached_end or self._packets == 0:
+            return False
+        if not self.duration:
+            return True
+        return self._packets * 0.02 >= self.duration - early_end_margin(self.duration)
+
+    def _discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+    def cleanup(self) -> None:
+        # Killing ffmpeg makes the reader see EOF too; only an end reached before counts
+        reached_end = self._finished
+        self.source.cleanup()
+        if self._file is None:
+            return
+        if not self._complete(reached_end):
+            self._discard()
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self.cache.commit(self.video_id, self.temp_path)
+        except OSError as e:
+            print(f"Audio cache commit failed: {e!r}")
+            self._discard()
+
+
+def can_passthrough(track, max_bitrate: int) -> bool:
+    """True if the stream is Opus at a bitrate we're happy to send unchanged."""
+    return track.acodec == "opus" and (track.abr is None or track.abr <= max_bitrate)
+
+
+def _input_options(stream_url: str, headers: dict[str, str] | None, start: float = 0.0) -> str:
+    before_options = ""
+    # Reconnect and header options only apply to the http protocol
+    if stream_url.startswith(("http://", "https://")):
+        before_options = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+        if headers:
+            header_lines = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+            before_options += f' -headers "{header_lines}"'
+    if start > 0:
+        # Input seeking, so the skipped part isn't downloaded
+        before_options += f" -ss {start:.2f}"
+    return before_options
+
+
+def create_ffmpeg_source(
+    stream_url: str,
+    *,
+    mode: str = "pcm",
+    headers: dict[str, str] | None = None,
+    passthrough: bool = False,
+    bitrate: int = 128,
+    start: float = 0.0,
+    gain: float = 1.0,
+    volume: float = 1.0,
+    encode_pool: EncodePool | None = None,
+    on_loudness_log: Callable[[str], None] | None = None,
+) -> discord.AudioSource:
+    """
+    Spawn ffmpeg for a stream, ``start`` seconds in.
+
+    ``pcm`` decodes to PCM and leaves Opus encoding to discord.py, or to
+    ``encode_pool``'s worker processes if given. ``opus`` has ffmpeg emit Opus
+    directly, remuxing the original packets when ``passthrough`` is set and
+    transcoding with libopus otherwise.
+
+    ffmpeg scales the audio by ``gain`` (linear), which rules out passthrough.
+    ``volume`` is the starting volume of an encode pool stream, which unlike
+    ``gain`` can be changed while it plays.
+
+    With ``on_loudness_log``, ffmpeg also measures the audio it plays with
+    ebur128 (before the gain, and ruling out passthrough too) and the
+    callback gets the tail of its log once it exits, on a background thread.
+    """
+    before_options = _input_options(stream_url, headers, start)
+    filters = []
+    if on_loudness_log is not None:
+        # Frame logs at verbose, so only the summary shows at info
+        filters.append("ebur128=peak=true:framelog=verbose")
+    if gain != 1.0:
+        filters.append(f"volume={gain:.4f}")
+    options = "-vn"
+    if filters:
+        options += f" -af {','.join(filters)}"
+        passthrough = False
+    if on_loudness_log is not None:
+        # The summary and final progress report are logged at info
+        options += " -nostats -loglevel info"
+
+    if encode_pool is not None and mode == "pcm":
+        # Same command line discord.FFmpegPCMAudio would run
+        args = ["ffmpeg", *shlex.split(before_options), "-i", stream_url]
+        args += ["-f", "s16le", "-ar", "48000", "-ac", "2", "-loglevel", "warning"]
+        args += [*shlex.split(options), "pipe:1"]
+        return encode_pool.open(args, bitrate, volume, on_log=on_loudness_log)
+
+    log = _log_pipe(on_loudness_log) if on_loudness_log is not None else None
+    try:
+        if mode == "opus":
+            return discord.FFmpegOpusAudio(
+                stream_url,
+                bitrate=bitrate,
+                codec="copy" if passthrough else None,
+                before_options=before_options,
+                options=options,
+                stderr=log,
+            )
+        return discord.FFmpegPCMAudio(
+            stream_url,
+            before_options=before_options,
+            options=options,
+            stderr=log,
+        )
+    finally:
+        # ffmpeg holds its own copy; the reader sees EOF once ffmpeg exits
+        if log is not None:
+            log.close()
+
+
+def _log_pipe(on_exit: Callable[[str], None]) -> BinaryIO:
+    """
+    Write end of a pipe to give ffmpeg as its stderr. A thread reads the other
+    end and hands ``on_exit`` the log's tail once every writer has closed it.
+    """
+    read_fd, write_fd = os.pipe()
+
+    def drain() -> None:
+        with open(read_fd, "rb") as log:
+            on_exit(read_log_tail(log))
+
+    threading.Thread(target=drain, name="ffmpeg-log", daemon=True).start()
+    return open(write_fd, "wb")
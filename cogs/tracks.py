@@ -0,0 +1,229 @@
+import random
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+from services.youtube_service import select_audio_format, stream_expires_at
+
+# Most tracks carry identical yt-dlp request headers; share one dict between them
+_shared_headers: dict[frozenset, dict[str, str]] = {}
+
+
+def _intern_headers(headers: Optional[Mapping[str, str]]) -> Optional[dict[str, str]]:
+    if not headers:
+        return None
+    key = frozenset(headers.items())
+    shared = _shared_headers.get(key)
+    if shared is None:
+        if len(_shared_headers) >= 64:
+            _shared_headers.clear()
+        shared = _shared_headers[key] = dict(headers)
+    return shared
+
+
+def _stream_fields(info: Mapping[str, Any], bitrate: Optional[int]) -> Mapping[str, Any]:
+    """The stream to play from a resolved result, matched to ``bitrate`` (kbps) if given."""
+    if bitrate:
+        chosen = select_audio_format(info.get("formats") or [], bitrate)
+        if chosen is not None:
+            return {
+                "stream_url": chosen["url"],
+                "acodec": chosen.get("acodec"),
+                "abr": chosen.get("abr"),
+            }
+    return info
+
+
+class Track:
+    """
+    A queued track: the metadata we play and display, and the requester's ID.
+    Holds no Discord objects, so large queues don't keep members alive.
+    ``http_headers`` may be shared between tracks and must not be mutated.
+    ``expires_at`` is when ``stream_url`` stops working (Unix time), if known.
+    """
+
+    __slots__ = (
+        "id",
+        "title",
+        "webpage_url",
+        "duration",
+        "thumbnail",
+        "stream_url",
+        "expires_at",
+        "http_headers",
+        "acodec",
+        "abr",
+        "added_by_id",
+    )
+
+    def __init__(
+        self,
+        id: Optional[str],
+        title: Optional[str],
+        webpage_url: Optional[str],
+        duration: Optional[float] = None,
+        thumbnail: Optional[str] = None,
+        stream_url: Optional[str] = None,
+        http_headers: Optional[dict[str, str]] = None,
+        acodec: Optional[str] = None,
+        abr: Optional[float] = None,
+        added_by_id: Optional[int] = None,
+    ) -> None:
+        self.id = id
+        self.title = title
+        self.webpage_url = webpage_url
+        self.duration = duration
+        self.thumbnail = thumbnail
+        self.stream_url = stream_url
+        self.expires_at = stream_expires_at(stream_url)
+        self.http_headers = http_headers
+        self.acodec = acodec
+        self.abr = abr
+        self.added_by_id = added_by_id
+
+    @classmethod
+    def from_info(
+        cls,
+        info: Mapping[str, Any],
+        added_by_id: Optional[int] = None,
+        bitrate: Optional[int] = None,
+    ) -> "Track":
+        """
+        Build a track from a search result or playlist entry, choosing the
+        cheapest stream that satisfies ``bitrate`` (kbps) when one is given.
+        """
+        stream = _stream_fields(info, bitrate)
+        return cls(
+            id=info.get("id"),
+            title=info.get("title"),
+            webpage_url=info.get("webpage_url"),
+            duration=info.get("duration"),
+            thumbnail=info.get("thumbnail"),
+            stream_url=stream.get("stream_url"),
+            http_headers=_intern_headers(info.get("http_headers")),
+            acodec=stream.get("acodec"),
+            abr=stream.get("abr"),
+            added_by_id=added_by_id,
+        )
+
+    def update_stream(self, info: Mapping[str, Any], bitrate: Optional[int] = None) -> None:
+        """Take the stream from a fresh resolve, filling in missing metadata."""
+        stream = _stream_fields(info, bitrate)
+        self.stream_url = stream.get("stream_url")
+        self.expires_at = stream_expires_at(self.stream_url)
+        self.http_headers = _intern_headers(info.get("http_headers"))
+        self.acodec = stream.get("acodec")
+        self.abr = stream.get("abr")
+        # Playlist placeholders only carry what the flat listing provided
+        self.title = self.title or info.get("title")
+        self.duration = self.duration or info.get("duration")
+        self.thumbnail = self.thumbnail or info.get("thumbnail")
+
+    def to_record(self) -> list[Any]:
+        """
+        Compact JSON form for the queue journal. The stream is left out, it
+        will have expired by the time the record is read back.
+        """
+        return [
+            self.id,
+            self.title,
+            self.webpage_url,
+            self.duration,
+            self.thumbnail,
+            self.added_by_id,
+        ]
+
+    @classmethod
+    def from_record(cls, record: list[Any]) -> "Track":
+        id, title, webpage_url, duration, thumbnail, added_by_id = record
+        return cls(
+            id=id,
+            title=title,
+            webpage_url=webpage_url,
+            duration=duration,
+            thumbnail=thumbnail,
+            added_by_id=added_by_id,
+        )
+
+    def __repr__(self) -> str:
+        return f"<Track {self.id} {self.title!r}>"
+
+
+class TrackQueue:
+    """
+    Play queue with cheap positional edits.
+
+    Tracks live in a list behind a moving head index: taking the next track is
+    O(1) amortised, and indexing, removal, moves and bulk inserts are a single
+    pointer memmove, fast well past 100k tracks. Positions are 0-based.
+    """
+
+    __slots__ = ("_items", "_head")
+
+    # Reclaim popped slots once there are this many and they're half the list
+    _COMPACT_AFTER = 1024
+
+    def __init__(self, tracks: Iterable[Track] = ()) -> None:
+        self._items: list[Optional[Track]] = list(tracks)
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._items) - self._head
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[Track]:
+        for i in range(self._head, len(self._items)):
+            yield self._items[i]  # type: ignore[misc]
+
+    def __getitem__(self, index: int) -> Track:
+        return self._items[self._index(index)]  # type: ignore[return-value]
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("queue index out of range")
+        return self._head + index
+
+    def append(self, track: Track) -> None:
+        self._items.append(track)
+
+    def extend(self, tracks: Iterable[Track]) -> None:
+        self._items.extend(tracks)
+
+    def insert(self, index: int, tracks: Iterable[Track]) -> None:
+        """Insert tracks before position ``index`` (clamped to the queue)."""
+        index = self._head + max(0, min(index, len(self)))
+        self._items[index:index] = tracks
+
+    def popleft(self) -> Track:
+        if not self:
+            raise IndexError("pop from an empty queue")
+        track = self._items[self._head]
+        # Drop the reference so popped tracks can be freed before compaction
+        self._items[self._head] = None
+        self._head += 1
+        if self._head >= self._COMPACT_AFTER and self._head * 2 >= len(self._items):
+            del self._items[: self._head]
+            self._head = 0
+        return track  # type: ignore[return-value]
+
+    def remove(self, index: int) -> Track:
+        return self._items.pop(self._index(index))  # type: ignore[return-value]
+
+    def move(self, source: int, destination: int) -> Track:
+        """Move the track at ``source`` so it ends up at ``destination``."""
+        track = self._items.pop(self._index(source))
+        destination = max(0, min(destination, len(self)))
+        self._items.insert(self._head + destination, track)
+        return track  # type: ignore[return-value]
+
+    def shuffle(self, rng: random.Random | None = None) -> None:
+        tracks = self._items[self._head :]
+        (rng or random).shuffle(tracks)
+        self._items = tracks
+        self._head = 0
+
+    def clear(self) -> None:
+        self._items = []
+        self._head = 0
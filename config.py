@@ -1,8 +1,14 @@
 import discord
+import os
 from functools import lru_cache
+from typing import Literal, Optional
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Bitrates (kbps) discord.py's Opus encoder accepts
+MIN_OPUS_BITRATE = 16
+MAX_OPUS_BITRATE = 512
+
 
 class AppConfig(BaseSettings):
     discord_bot_key: str = Field(..., alias="DISCORD_TOKEN")
@@ -15,6 +21,124 @@ class AppConfig(BaseSettings):
     )
     ytdl_cookies: str = Field("", alias="YTDL_COOKIES")
 
+    # Prometheus text endpoint at http://host:port/metrics
+    metrics_enabled: bool = Field(False, alias="METRICS_ENABLED")
+    metrics_host: str = Field("127.0.0.1", alias="METRICS_HOST")
+    metrics_port: int = Field(9464, alias="METRICS_PORT")
+
+    # yt-dlp extraction pool, each worker owns its own YoutubeDL
+    extraction_mode: Literal["thread", "process"] = Field("thread", alias="EXTRACTION_MODE")
+    extraction_workers: int = Field(4, alias="EXTRACTION_WORKERS")
+    extraction_queue_size: int = Field(32, alias="EXTRACTION_QUEUE_SIZE")
+    extraction_timeout: float = Field(45.0, alias="EXTRACTION_TIMEOUT")
+
+    # Concurrency adapts between 1 and EXTRACTION_WORKERS; slower extractions count
+    # as congestion. Repeated throttling pauses extraction with a growing cooldown.
+    extraction_latency_target: float = Field(10.0, alias="EXTRACTION_LATENCY_TARGET")
+    breaker_failure_threshold: int = Field(5, alias="BREAKER_FAILURE_THRESHOLD")
+    breaker_cooldown: float = Field(30.0, alias="BREAKER_COOLDOWN")
+    breaker_max_cooldown: float = Field(600.0, alias="BREAKER_MAX_COOLDOWN")
+
+    # Playlists are listed lazily in pages, up to a maximum number of tracks
+    playlist_page_size: int = Field(100, alias="PLAYLIST_PAGE_SIZE")
+    playlist_max_tracks: int = Field(1000, alias="PLAYLIST_MAX_TRACKS")
+
+    # /queue with several queries (split on ";" and newlines, or from a text file)
+    # resolves up to QUEUE_BATCH_CONCURRENCY of them at a time
+    queue_batch_max: int = Field(25, alias="QUEUE_BATCH_MAX")
+    queue_batch_concurrency: int = Field(8, alias="QUEUE_BATCH_CONCURRENCY")
+
+    # Search result cache: in-memory LRU backed by SQLite (empty path = memory only)
+    search_cache_path: str = Field("cache/search.sqlite3", alias="SEARCH_CACHE_PATH")
+    search_cache_size: int = Field(2048, alias="SEARCH_CACHE_SIZE")
+    search_cache_ttl: int = Field(30 * 24 * 3600, alias="SEARCH_CACHE_TTL")
+    stream_url_ttl: int = Field(3 * 3600, alias="STREAM_URL_TTL")
+
+    # Autocomplete for /play and /queue from resolved titles and queries (empty path = memory only)
+    suggestions_path: str = Field("cache/suggestions.sqlite3", alias="SUGGESTIONS_PATH")
+    suggestions_max_videos: int = Field(20000, alias="SUGGESTIONS_MAX_VIDEOS")
+
+    # "opus" lets ffmpeg emit Opus (copying YouTube's Opus packets when possible),
+    # "pcm" decodes to PCM and encodes to Opus in-process
+    playback_mode: Literal["opus", "pcm"] = Field("opus", alias="PLAYBACK_MODE")
+    passthrough_max_bitrate: int = Field(160, alias="PASSTHROUGH_MAX_BITRATE")  # kbps
+    opus_bitrate: int = Field(128, alias="OPUS_BITRATE")  # kbps, when transcoding
+    # Streams are picked to match the voice channel's bitrate; per-guild overrides
+    # in kbps as JSON, e.g. {"123456789012345678": 96}
+    guild_bitrates: dict[int, int] = Field(default_factory=dict, alias="GUILD_BITRATES")
+    # PCM mode only: Opus-encode streams in this many worker processes (0 = in-process)
+    encode_processes: int = Field(0, alias="ENCODE_PROCESSES")
+
+    # Loudness normalization: each video is measured during its first full play
+    # (which isn't leveled) and later plays get a fixed gain towards
+    # LOUDNESS_TARGET (LUFS) without exceeding LOUDNESS_MAX_TRUE_PEAK (dBTP)
+    loudness_normalization: bool = Field(False, alias="LOUDNESS_NORMALIZATION")
+    loudness_target: float = Field(-16.0, alias="LOUDNESS_TARGET")
+    loudness_max_true_peak: float = Field(-1.0, alias="LOUDNESS_MAX_TRUE_PEAK")
+    loudness_path: str = Field("cache/loudness.sqlite3", alias="LOUDNESS_PATH")
+
+    # Local cache of played audio as Opus packets (empty dir = disabled, opus mode only)
+    audio_cache_dir: str = Field("", alias="AUDIO_CACHE_DIR")
+    audio_cache_max_mb: int = Field(2048, alias="AUDIO_CACHE_MAX_MB")
+    audio_cache_max_track_seconds: int = Field(1200, alias="AUDIO_CACHE_MAX_TRACK_SECONDS")
+
+    # Look-ahead: prepare the next track this many seconds before the current one ends
+    lookahead_seconds: int = Field(20, alias="LOOKAHEAD_SECONDS")
+    prebuffer_frames: int = Field(100, alias="PREBUFFER_FRAMES")  # 20 ms each
+    stream_refresh_margin: int = Field(120, alias="STREAM_REFRESH_MARGIN")
+
+    # Read-ahead: frames (20 ms each) buffered per stream on a background thread,
+    # at up to 3.75 KB each in PCM mode and 1.25 KB in Opus mode (0 = disabled)
+    readahead_frames: int = Field(250, alias="READAHEAD_FRAMES")
+
+    # Leave after this many seconds with nobody listening, or with nothing
+    # playing (or no voice connection) for IDLE_TIMEOUT
+    alone_timeout: int = Field(30, alias="ALONE_TIMEOUT")
+    idle_timeout: int = Field(600, alias="IDLE_TIMEOUT")
+
+    # Queue journal: sessions (voice channel, queue, playing track) are resumed
+    # after a restart; positions are checkpointed every QUEUE_CHECKPOINT_SECONDS
+    # (empty path = disabled)
+    queue_journal_path: str = Field("cache/queue_journal.jsonl", alias="QUEUE_JOURNAL_PATH")
+    queue_checkpoint_seconds: float = Field(15.0, alias="QUEUE_CHECKPOINT_SECONDS")
+
+    # Status messages: bursts within this window are edited/sent as one message
+    status_batch_seconds: float = Field(1.0, alias="STATUS_BATCH_SECONDS")
+
+    # Startup: remembered libopus location and last synced command tree hash
+    opus_cache_path: str = Field("cache/libopus_path", alias="OPUS_CACHE_PATH")
+    command_hash_path: str = Field("cache/command_tree.sha256", alias="COMMAND_HASH_PATH")
+
+    # Sharding: empty SHARD_COUNT uses Discord's recommendation. With more than
+    # one process, shards are split across worker processes under a supervisor.
+    shard_count: Optional[int] = Field(None, alias="SHARD_COUNT")
+    shard_processes: int = Field(1, alias="SHARD_PROCESSES")
+
+    @field_validator("shard_count", mode="before")
+    @classmethod
+    def validate_shard_count(cls, v):
+        return None if v == "" else v
+
+    @field_validator("opus_bitrate")
+    @classmethod
+    def validate_opus_bitrate(cls, v):
+        if not MIN_OPUS_BITRATE <= v <= MAX_OPUS_BITRATE:
+            raise ValueError(
+                f"OPUS_BITRATE must be between {MIN_OPUS_BITRATE} and {MAX_OPUS_BITRATE} kbps"
+            )
+        return v
+
+    @field_validator("guild_bitrates")
+    @classmethod
+    def validate_guild_bitrates(cls, v):
+        for guild_id, bitrate in v.items():
+            if not MIN_OPUS_BITRATE <= bitrate <= MAX_OPUS_BITRATE:
+                raise ValueError(
+                    f"GUILD_BITRATES for {guild_id} must be between "
+                    f"{MIN_OPUS_BITRATE} and {MAX_OPUS_BITRATE} kbps"
+                )
+        return v
+
     @field_validator("embed_color", mode="before")
     @classmethod
     def validate_embed_color(cls, v):
@@ -32,6 +156,27 @@ class AppConfig(BaseSettings):
         if not self.discord_bot_key:
             raise ValueError("DISCORD_TOKEN must be set in .env file")
 
+    def use_shard_worker(self, index: int) -> None:
+        """Give shard worker ``index`` its own caches and metrics port."""
+        for name in (
+            "search_cache_path",
+            "suggestions_path",
+            "loudness_path",
+            "queue_journal_path",
+        ):
+            path = getattr(self, name)
+            if path:
+                setattr(self, name, _worker_path(path, index))
+        if self.audio_cache_dir:
+            self.audio_cache_dir = os.path.join(self.audio_cache_dir, f"worker{index}")
+        self.metrics_port += index
+
+
+def _worker_path(path: str, index: int) -> str:
+    """``cache/search.sqlite3`` -> ``cache/search.worker1.sqlite3``"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{index}{ext}"
+
 
 @lru_cache
 def get_config() -> AppConfig:
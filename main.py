@@ -1,16 +1,25 @@
-import asyncio
-from services.bot_service import MusicBot
-from config import get_config
-import discord
+import time
+
+# Taken before the heavier imports so the startup report includes them
+started_at = time.perf_counter()
+
+import asyncio  # noqa: E402
+from services.bot_service import MusicBot  # noqa: E402
+from services.shard_launcher import launch  # noqa: E402
+from config import get_config  # noqa: E402
+import discord  # noqa: E402
 
 config = get_config()
 
 
 async def main() -> None:
-    bot = MusicBot()
+    bot = MusicBot(started_at=started_at, shard_count=config.shard_count)
     async with bot:
         await bot.start(config.discord_bot_key)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if config.shard_processes > 1:
+        launch()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,144 @@
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from typing import BinaryIO, Iterator, Optional
+
+# Cached audio is a plain sequence of Opus packets, each prefixed with its
+# length, so playback from cache needs neither ffmpeg nor a demuxer.
+_MAGIC = b"LUNAOPUS1"
+_LENGTH = struct.Struct(">H")
+_SUFFIX = ".opuspk"
+_TEMP_SUFFIX = ".part"
+
+
+def write_header(file: BinaryIO) -> None:
+    file.write(_MAGIC)
+
+
+def write_packet(file: BinaryIO, packet: bytes) -> None:
+    file.write(_LENGTH.pack(len(packet)))
+    file.write(packet)
+
+
+def iter_packets(file: BinaryIO) -> Iterator[bytes]:
+    if file.read(len(_MAGIC)) != _MAGIC:
+        return
+    while True:
+        prefix = file.read(_LENGTH.size)
+        if len(prefix) < _LENGTH.size:
+            return
+        (length,) = _LENGTH.unpack(prefix)
+        packet = file.read(length)
+        if len(packet) < length:
+            return
+        yield packet
+
+
+class AudioCache:
+    """
+    Size-bounded on-disk cache of Opus packets keyed by video ID.
+
+    Entries are written to a temporary file and renamed into place once
+    complete, so a crash can never leave a truncated entry behind. The least
+    recently played entries are evicted once ``max_bytes`` is exceeded.
+    Safe to use from the event loop and from discord.py's player threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        found: list[tuple[float, str, int]] = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(_TEMP_SUFFIX):
+                # Left over from an interrupted write
+                os.remove(path)
+                continue
+            if not name.endswith(_SUFFIX):
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, name[: -len(_SUFFIX)], stat.st_size))
+
+        # Oldest first, so the LRU order survives restarts
+        for _, video_id, size in sorted(found):
+            self._entries[video_id] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory, video_id + _SUFFIX)
+
+    def __contains__(self, video_id: object) -> bool:
+        return video_id in self._entries
+
+    def open(self, video_id: str) -> Optional[BinaryIO]:
+        """Open a cached entry for reading and mark it recently used."""
+        with self._lock:
+            if video_id not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(video_id)
+            self.hits += 1
+
+        path = self._path(video_id)
+        try:
+            file = open(path, "rb")
+            os.utime(path)
+        except OSError:
+            self._forget(video_id)
+            return None
+        return file
+
+    def temp_path(self, video_id: str) -> str:
+        return os.path.join(
+            self.directory, f"{video_id}.{uuid.uuid4().hex}{_TEMP_SUFFIX}"
+        )
+
+    def commit(self, video_id: str, temp_path: str) -> None:
+        """Atomically move a fully written temp file into the cache."""
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            os.remove(temp_path)
+            return
+        os.replace(temp_path, self._path(video_id))
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(video_id, 0)
+            self._entries[video_id] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            video_id, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(video_id))
+            except OSError:
+                pass
+
+    def _forget(self, video_id: str) -> None:
+        with self._lock:
+            self._total_bytes -= self._entries.pop(video_id, 0)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,31 +1,139 @@
 import discord
+import hashlib
+import json
 import logging
+import os
+import time
+from aiohttp import web
 from discord.ext import commands
 
 from config import get_config
+from .metrics import start_metrics_server
 
 config = get_config()
 
 logging.basicConfig(level=logging.INFO)
 
 
-class MusicBot(commands.Bot):
+class StartupTimer:
+    """Wall-clock time spent in each startup phase, measured back to back."""
+
+    def __init__(self, started_at: float | None = None) -> None:
+        self.started_at = started_at or time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+        self._last = self.started_at
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self) -> str:
+        lines = [f"  {phase:<20}{seconds * 1000:>8.0f} ms" for phase, seconds in self.phases]
+        total = self._last - self.started_at
+        lines.append(f"  {'total':<20}{total * 1000:>8.0f} ms")
+        return "Startup timings:\n" + "\n".join(lines)
+
+
+class MusicBot(commands.AutoShardedBot):
+    """
+    Runs all of its shards on one gateway connection each, in this process.
+    ``shard_ids`` limits it to a subset when shards are spread over processes.
+    """
+
     inVoice: bool = False
+    metrics_runner: web.AppRunner | None = None
 
     def __init__(
         self,
+        started_at: float | None = None,
+        shard_ids: list[int] | None = None,
+        shard_count: int | None = None,
     ):
-        commands.Bot.__init__(
-            self, command_prefix=config.command_prefix, intents=config.intents
+        commands.AutoShardedBot.__init__(
+            self,
+            command_prefix=config.command_prefix,
+            intents=config.intents,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
         )
+        self.startup = StartupTimer(started_at)
+        self.startup_reported = False
+
+    async def start(self, token: str, *, reconnect: bool = True) -> None:
+        self.startup.mark("imports + init")
+        await super().start(token, reconnect=reconnect)
 
     async def setup_hook(self) -> None:
+        self.startup.mark("login")
+        if config.metrics_enabled:
+            self.metrics_runner = await start_metrics_server(
+                config.metrics_host, config.metrics_port
+            )
+            logging.info(
+                f"Metrics on http://{config.metrics_host}:{config.metrics_port}/metrics"
+            )
+
         for ext in config.enabled_cogs:
             await self.load_extension(f"cogs.{ext}")
             print("registered " + ext)
+            self.startup.mark(f"load {ext}")
 
         # await self.tree.sync()
 
+    @property
+    def is_primary(self) -> bool:
+        """Whether this process handles once-per-bot work like command sync."""
+        return self.shard_ids is None or 0 in self.shard_ids
+
+    async def sync_commands_if_changed(self, guild: discord.abc.Snowflake | None = None) -> bool:
+        """
+        Sync the command tree only if its payload changed since the last sync,
+        saving a REST round trip (and rate limit budget) on most restarts.
+        Returns whether a sync happened.
+        """
+        commands_payload = [c.to_dict(self.tree) for c in self.tree.get_commands(guild=guild)]
+        digest = hashlib.sha256(
+            json.dumps(commands_payload, sort_keys=True).encode()
+        ).hexdigest()
+        scope = str(guild.id) if guild else "global"
+
+        hashes: dict[str, str] = {}
+        path = config.command_hash_path
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    hashes = json.load(f)
+            except (OSError, ValueError):
+                hashes = {}
+
+        if hashes.get(scope) == digest:
+            logging.info(f"Command tree unchanged for {scope}, skipping sync")
+            return False
+
+        await self.tree.sync(guild=guild)
+        if path:
+            hashes[scope] = digest
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, "w") as f:
+                    json.dump(hashes, f)
+            except OSError as e:
+                print(f"Could not save command tree hash: {e}")
+        return True
+
+    async def close(self) -> None:
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        await super().close()
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        logging.info(f"Shard {shard_id} ready")
+
     async def on_ready(self) -> None:
-        # Fires when the bot is ready
+        # Fires when the bot is ready (again after every reconnect)
         logging.info(f"Logged in as {self.user}")
+        if not self.startup_reported:
+            self.startup_reported = True
+            self.startup.mark("gateway ready")
+            logging.info(self.startup.report())
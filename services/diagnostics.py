@@ -0,0 +1,223 @@
+import asyncio
+import bisect
+import cProfile
+import gc
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+import discord
+
+# Nothing here runs until asked: each capture is time-boxed and stops its
+# profiler, sampler or probe when it ends. tracemalloc is the exception, it
+# traces from "start" until "stop".
+
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+# ----- Event loop -----
+
+
+async def profile_loop(seconds: float, limit: int = 60) -> str:
+    """cProfile everything that runs on the event loop's thread for ``seconds``."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    out.write("\n")
+    stats.sort_stats("tottime").print_stats(limit)
+    return out.getvalue()
+
+
+async def sample_loop(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sample the event loop thread's stack every ``interval`` seconds from a
+    helper thread, for ``seconds``. Returns collapsed stacks (one
+    ``outer;...;inner count`` line per stack), the input flamegraph.pl and
+    speedscope take. Cheaper than cProfile and unbiased towards small calls.
+    """
+    target = threading.get_ident()
+    stacks: Counter[str] = Counter()
+    stop = threading.Event()
+
+    def run() -> None:
+        while not stop.wait(interval):
+            frame = sys._current_frames().get(target)
+            labels = []
+            while frame is not None:
+                labels.append(f"{module_of(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            stacks[";".join(reversed(labels))] += 1
+
+    sampler = threading.Thread(target=run, name="loop-sampler", daemon=True)
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        stop.set()
+        await asyncio.to_thread(sampler.join)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def measure_lag(seconds: float, interval: float = 0.05) -> list[float]:
+    """How late (seconds) each ``interval`` sleep woke up, over ``seconds``."""
+    loop = asyncio.get_running_loop()
+    lags: list[float] = []
+    end = loop.time() + seconds
+    while loop.time() < end:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - started - interval))
+    return lags
+
+
+def format_lag(lags: list[float]) -> str:
+    if not lags:
+        return "No samples\n"
+    ordered = sorted(lags)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+    for lag in lags:
+        counts[bisect.bisect_left(LAG_BUCKETS_MS, lag * 1000)] += 1
+    widest = max(counts)
+    lines = [
+        f"{len(lags)} samples, p50 {percentile(0.5):.1f} ms, p99 {percentile(0.99):.1f} ms, "
+        f"max {ordered[-1] * 1000:.1f} ms",
+        "",
+    ]
+    labels = [f"<= {bound} ms" for bound in LAG_BUCKETS_MS] + [f"> {LAG_BUCKETS_MS[-1]} ms"]
+    for label, count in zip(labels, counts):
+        bar = "#" * round(40 * count / widest) if widest else ""
+        lines.append(f"{label:>12} {count:>7} {bar}")
+    return "\n".join(lines) + "\n"
+
+
+# ----- Memory -----
+
+
+_module_names: dict[str, str] = {}
+
+
+def module_of(filename: str) -> str:
+    """Dotted module name for a source file, from the longest matching sys.path entry."""
+    name = _module_names.get(filename)
+    if name is not None:
+        return name
+    name = filename
+    best = ""
+    for entry in sys.path:
+        root = os.path.abspath(entry or ".") + os.sep
+        if filename.startswith(root) and len(root) > len(best):
+            best = root
+    if best:
+        relative = os.path.splitext(filename[len(best) :])[0]
+        name = relative.replace(os.sep, ".").removesuffix(".__init__")
+    _module_names[filename] = name
+    return name
+
+
+def _by_module(stats) -> list[tuple[str, int, int]]:
+    totals: dict[str, list[int]] = {}
+    for stat in stats:
+        # Statistic has size/count, StatisticDiff size_diff/count_diff
+        size = getattr(stat, "size_diff", stat.size)
+        count = getattr(stat, "count_diff", stat.count)
+        total = totals.setdefault(module_of(stat.traceback[0].filename), [0, 0])
+        total[0] += size
+        total[1] += count
+    return sorted(
+        ((module, size, count) for module, (size, count) in totals.items()),
+        key=lambda row: abs(row[1]),
+        reverse=True,
+    )
+
+
+class MemoryTracer:
+    """tracemalloc snapshots, each reported against the one before it."""
+
+    def __init__(self) -> None:
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._previous = tracemalloc.take_snapshot()
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot(self, limit: int = 40) -> str:
+        """Allocations by module and by line, with growth since the last snapshot."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        previous, self._previous = self._previous, snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Traced: {current / 1e6:.1f} MB now, {peak / 1e6:.1f} MB peak", ""]
+
+        lines.append("Live allocations by module:")
+        for module, size, count in _by_module(snapshot.statistics("filename"))[:limit]:
+            lines.append(f"{size / 1024:>12.1f} KiB {count:>9} blocks  {module}")
+        if previous is not None:
+            lines += ["", "Change since the last snapshot, by module:"]
+            diff = snapshot.compare_to(previous, "filename")
+            for module, size, count in _by_module(diff)[:limit]:
+                if size:
+                    lines.append(f"{size / 1024:>+12.1f} KiB {count:>+9} blocks  {module}")
+            lines += ["", "Change since the last snapshot, by line:"]
+            for stat in snapshot.compare_to(previous, "lineno")[:limit]:
+                frame = stat.traceback[0]
+                lines.append(
+                    f"{stat.size_diff / 1024:>+12.1f} KiB {stat.count_diff:>+9} blocks  "
+                    f"{module_of(frame.filename)}:{frame.lineno}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+# ----- Counts -----
+
+
+def ffmpeg_processes() -> int:
+    """Live ffmpeg processes owned by discord.py sources, found by scanning the heap."""
+    alive = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, discord.FFmpegAudio):
+            process = getattr(obj, "_process", None)
+            if process is not None and process.poll() is None:
+                alive += 1
+    return alive
+
+
+def process_counts() -> dict[str, object]:
+    """Process-wide numbers that don't depend on the bot's own state."""
+    try:
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        max_rss = 0
+    return {
+        "ffmpeg processes": ffmpeg_processes(),
+        "asyncio tasks": len(asyncio.all_tasks()),
+        "threads": threading.active_count(),
+        "gc objects": len(gc.get_objects()),
+        "max rss (KiB)": max_rss,
+    }
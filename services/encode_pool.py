@@ -0,0 +1,386 @@
+import itertools
+import multiprocessing
+import subprocess
+import threading
+from collections import deque
+from multiprocessing.connection import Connection
+from typing import BinaryIO, Callable, Optional
+
+import discord
+
+# 20 ms of 48 kHz stereo s16le, what ffmpeg writes per Opus frame
+PCM_FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE
+SAMPLES_PER_FRAME = discord.opus.Encoder.SAMPLES_PER_FRAME
+
+# Packets a worker may encode ahead of the bot; the bot returns credits as it reads
+STREAM_WINDOW = 50
+
+# End of an ffmpeg log kept for whoever asked for it
+LOG_TAIL_BYTES = 16 * 1024
+
+
+class EncodeError(Exception):
+    """An encode worker failed or exited while streaming."""
+
+
+def read_log_tail(file: BinaryIO) -> str:
+    """Read an ffmpeg log until ffmpeg exits, returning its last LOG_TAIL_BYTES."""
+    tail = b""
+    while chunk := file.read(LOG_TAIL_BYTES):
+        tail = (tail + chunk)[-LOG_TAIL_BYTES:]
+    return tail.decode(errors="replace")
+
+
+# ----- Worker side -----
+# Each worker process runs one thread per stream: ffmpeg decodes to PCM and the
+# thread encodes it to Opus, sending packets back over the worker's pipe.
+# Messages from the bot: ("open", id, (args, bitrate, volume, log)), ("credit", id, n),
+# ("volume", id, factor), ("close", id, None). To the bot: ("packet", id, bytes),
+# ("end", id, error) and, for streams opened with log set, ("log", id, tail of ffmpeg's stderr).
+
+
+class _PCMFrames(discord.AudioSource):
+    """ffmpeg's PCM output as whole frames, the last one padded with silence."""
+
+    def __init__(self, stdout) -> None:
+        self.stdout = stdout
+
+    def read(self) -> bytes:
+        pcm = self.stdout.read(PCM_FRAME_SIZE)
+        if pcm and len(pcm) < PCM_FRAME_SIZE:
+            pcm = pcm.ljust(PCM_FRAME_SIZE, b"\0")
+        return pcm
+
+
+class _WorkerStream:
+    def __init__(
+        self,
+        stream_id: int,
+        args: list[str],
+        bitrate: int,
+        volume: float,
+        log: bool,
+        send,
+    ) -> None:
+        self.stream_id = stream_id
+        self.args = args
+        self.bitrate = bitrate
+        self.volume = volume
+        self.log = log
+        self.send = send
+        self.credits = threading.Semaphore(STREAM_WINDOW)
+        self.process: subprocess.Popen | None = None
+        self.stopped = False
+
+    def run(self) -> None:
+        error = None
+        try:
+            encoder = discord.opus.Encoder(bitrate=self.bitrate)
+            self.process = subprocess.Popen(
+                self.args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE if self.log else None,
+            )
+            if self.log:
+                threading.Thread(
+                    target=self._send_log, args=(self.process.stderr,), daemon=True
+                ).start()
+            frames = _PCMFrames(self.process.stdout)
+            # Scaled exactly like PCM sources played in-process
+            scaled = discord.PCMVolumeTransformer(frames, self.volume)
+            while not self.stopped:
+                self.credits.acquire()
+                if self.stopped:
+                    break
+                if self.volume != 1.0:
+                    scaled.volume = self.volume
+                    pcm = scaled.read()
+                else:
+                    pcm = frames.read()
+                if not pcm:
+                    break
+                self.send(("packet", self.stream_id, encoder.encode(pcm, SAMPLES_PER_FRAME)))
+        except Exception as e:
+            error = repr(e)
+        finally:
+            self._kill()
+        if not self.stopped:
+            self.send(("end", self.stream_id, error))
+
+    def _send_log(self, stderr: BinaryIO) -> None:
+        self.send(("log", self.stream_id, read_log_tail(stderr)))
+
+    def stop(self) -> None:
+        self.stopped = True
+        self.credits.release()
+        self._kill()
+
+    def _kill(self) -> None:
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _worker_main(conn: Connection, initializer: Optional[Callable[[], None]]) -> None:
+    if initializer is not None:
+        initializer()
+
+    send_lock = threading.Lock()
+    streams: dict[int, _WorkerStream] = {}
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            try:
+                conn.send(message)
+            except OSError:
+                # The bot went away; recv() below notices and stops the worker
+                pass
+
+    def run(stream: _WorkerStream) -> None:
+        try:
+            stream.run()
+        finally:
+            streams.pop(stream.stream_id, None)
+
+    while True:
+        try:
+            kind, stream_id, payload = conn.recv()
+        except (EOFError, OSError):
+            break
+        if kind == "open":
+            args, bitrate, volume, log = payload
+            stream = streams[stream_id] = _WorkerStream(
+                stream_id, args, bitrate, volume, log, send
+            )
+            threading.Thread(target=run, args=(stream,), daemon=True).start()
+        elif kind == "credit":
+            stream = streams.get(stream_id)
+            if stream is not None:
+                stream.credits.release(payload)
+        elif kind == "volume":
+            stream = streams.get(stream_id)
+            if stream is not None:
+                stream.volume = payload
+        elif kind == "close":
+            stream = streams.pop(stream_id, None)
+            if stream is not None:
+                stream.stop()
+
+    for stream in list(streams.values()):
+        stream.stop()
+
+
+# ----- Bot side -----
+
+
+class EncodedAudio(discord.AudioSource):
+    """
+    Opus packets streamed from an encode worker. Setting ``volume`` rescales
+    the PCM before encoding, from the packets the worker hasn't encoded yet.
+    """
+
+    def __init__(self, worker: "_Worker", stream_id: int, volume: float = 1.0) -> None:
+        self.worker = worker
+        self.stream_id = stream_id
+        self._volume = volume
+        self._packets: deque[bytes] = deque()
+        self._cond = threading.Condition()
+        self._ended = False
+        self._error: str | None = None
+        self._unacknowledged = 0
+
+    def _deliver(self, packet: bytes) -> None:
+        with self._cond:
+            self._packets.append(packet)
+            self._cond.notify()
+
+    def _end(self, error: str | None) -> None:
+        with self._cond:
+            self._ended = True
+            self._error = error
+            self._cond.notify()
+
+    def read(self) -> bytes:
+        with self._cond:
+            while not self._packets and not self._ended:
+                self._cond.wait()
+            if not self._packets:
+                if self._error is not None:
+                    raise EncodeError(self._error)
+                return b""
+            packet = self._packets.popleft()
+        # Credits go back in batches to keep pipe traffic down
+        self._unacknowledged += 1
+        if self._unacknowledged >= STREAM_WINDOW // 2:
+            self.worker.send(("credit", self.stream_id, self._unacknowledged))
+            self._unacknowledged = 0
+        return packet
+
+    @property
+    def volume(self) -> float:
+        return self._volume
+
+    @volume.setter
+    def volume(self, value: float) -> None:
+        self._volume = max(value, 0.0)
+        self.worker.send(("volume", self.stream_id, self._volume))
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self.worker.close_stream(self.stream_id)
+        self._end(None)
+        self._packets.clear()
+
+
+class _Worker:
+    def __init__(
+        self,
+        context: multiprocessing.context.SpawnContext,
+        index: int,
+        initializer: Optional[Callable[[], None]],
+    ) -> None:
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child, initializer),
+            name=f"encode-worker-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.streams: dict[int, EncodedAudio] = {}
+        # Outlive their stream: the log arrives once ffmpeg exits, after the end
+        self.log_handlers: dict[int, Callable[[str], None]] = {}
+        self._send_lock = threading.Lock()
+        self._receiver = threading.Thread(
+            target=self._receive, name=f"encode-receiver-{index}", daemon=True
+        )
+        self._receiver.start()
+
+    @property
+    def alive(self) -> bool:
+        return self._receiver.is_alive()
+
+    def send(self, message: tuple) -> None:
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except OSError:
+                # Dead worker; the receiver ends its streams
+                pass
+
+    def open_stream(
+        self,
+        stream_id: int,
+        args: list[str],
+        bitrate: int,
+        volume: float,
+        on_log: Optional[Callable[[str], None]],
+    ) -> EncodedAudio:
+        stream = self.streams[stream_id] = EncodedAudio(self, stream_id, volume)
+        if on_log is not None:
+            self.log_handlers[stream_id] = on_log
+        self.send(("open", stream_id, (args, bitrate, volume, on_log is not None)))
+        return stream
+
+    def close_stream(self, stream_id: int) -> None:
+        if self.streams.pop(stream_id, None) is not None:
+            self.send(("close", stream_id, None))
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                kind, stream_id, payload = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == "log":
+                handler = self.log_handlers.pop(stream_id, None)
+                if handler is not None:
+                    handler(payload)
+                continue
+            stream = self.streams.get(stream_id)
+            if stream is None:
+                continue
+            if kind == "packet":
+                stream._deliver(payload)
+            else:
+                self.streams.pop(stream_id, None)
+                stream._end(payload)
+
+        for stream in list(self.streams.values()):
+            stream._end("encode worker exited")
+        self.streams.clear()
+        self.log_handlers.clear()
+
+    def close(self) -> None:
+        self.conn.close()
+        self.process.terminate()
+
+
+class EncodePool:
+    """
+    Worker processes that run ffmpeg and Opus-encode its PCM output, so the
+    encoding of many concurrent PCM streams doesn't compete for the bot
+    process's GIL. Streams go to the least loaded worker and arrive as
+    ``EncodedAudio`` sources of ready Opus packets; discord.py's player
+    threads only pace and send them.
+
+    ``initializer`` runs in each worker before its first stream, e.g. to load
+    libopus; it must be picklable. Workers start with the first stream and
+    are replaced if they die.
+    """
+
+    def __init__(
+        self, processes: int, initializer: Optional[Callable[[], None]] = None
+    ) -> None:
+        self.processes = processes
+        self.initializer = initializer
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: list[_Worker | None] = [None] * processes
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _pick_worker(self) -> _Worker:
+        with self._lock:
+            for i, worker in enumerate(self._workers):
+                if worker is None or not worker.alive:
+                    if worker is not None:
+                        print(f"Encode worker {i} exited, restarting")
+                        worker.close()
+                    self._workers[i] = _Worker(self._context, i, self.initializer)
+            return min(self._workers, key=lambda w: len(w.streams))  # type: ignore[arg-type]
+
+    def open(
+        self,
+        args: list[str],
+        bitrate: int,
+        volume: float = 1.0,
+        on_log: Optional[Callable[[str], None]] = None,
+    ) -> EncodedAudio:
+        """
+        Start ``args`` (an ffmpeg command writing s16le PCM to stdout) on a
+        worker. ``on_log`` gets the tail of ffmpeg's stderr once it exits, on
+        the worker's receiver thread.
+        """
+        return self._pick_worker().open_stream(next(self._ids), args, bitrate, volume, on_log)
+
+    def stats(self) -> dict[str, int]:
+        workers = [w for w in self._workers if w is not None and w.alive]
+        return {
+            "workers": len(workers),
+            "streams": sum(len(w.streams) for w in workers),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, [None] * self.processes
+        for worker in workers:
+            if worker is not None:
+                worker.close()
+        for worker in workers:
+            if worker is not None:
+                worker.process.join(timeout=5)
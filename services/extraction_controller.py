@@ -0,0 +1,220 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from .extraction_pool import ExtractionBusy, ExtractionError, ExtractionTimeout
+
+T = TypeVar("T")
+
+# yt-dlp error text that means YouTube is pushing back, not that a video is missing
+_THROTTLE_MARKERS = ("429", "too many requests", "not a bot", "rate limit", "rate-limit")
+
+
+class ExtractionUnavailable(ExtractionError):
+    """Extractions are paused because YouTube is throttling or failing."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"extractions paused for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_throttled(error: Exception) -> bool:
+    """True for failures that suggest we should send YouTube fewer requests."""
+    if isinstance(error, ExtractionTimeout):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff from ``base``, capped, with half of it jittered."""
+    delay = min(cap, base * 2**attempt)
+    return random.uniform(delay / 2, delay)
+
+
+class ExtractionController:
+    """
+    Adaptive concurrency limit and circuit breaker in front of the extraction
+    pool.
+
+    The limit grows by one per limit's worth of fast successes and halves
+    (at most once per ``latency_target``) on throttling, timeouts or slow
+    extractions, in the manner of TCP's AIMD. ``failure_threshold``
+    throttled failures in a row open the breaker: calls fail fast with
+    ``ExtractionUnavailable`` for a jittered, exponentially growing cooldown,
+    after which a single probe decides whether to close it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        max_limit: int,
+        queue_size: int,
+        latency_target: float,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        min_limit: int = 1,
+    ) -> None:
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.queue_size = queue_size
+        self.latency_target = latency_target
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.open_until = 0.0
+        self._failures = 0  # throttled failures in a row
+        self._opens = 0  # times opened without a successful probe, drives backoff
+        self._probing = False
+
+        self.throttled = 0
+        self.short_circuited = 0
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Await ``call()`` once the breaker and concurrency limit allow it."""
+        probe = self._admit()
+        try:
+            await self._acquire()
+        except BaseException:
+            if probe:
+                self._probing = False
+            raise
+
+        started = time.monotonic()
+        try:
+            result = await call()
+        except ExtractionBusy:
+            # Local back pressure, says nothing about YouTube
+            self._release(probe)
+            raise
+        except ExtractionError as e:
+            self._release(probe)
+            if is_throttled(e):
+                self._on_throttled(probe)
+            else:
+                # YouTube answered, the video just isn't playable
+                self._on_success(probe, None)
+            raise
+        except BaseException:
+            self._release(probe)
+            raise
+        self._release(probe)
+        self._on_success(probe, time.monotonic() - started)
+        return result
+
+    # ----- Circuit breaker -----
+
+    def _admit(self) -> bool:
+        """Raise if the breaker is open; returns whether this call is the probe."""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now < self.open_until:
+                self.short_circuited += 1
+                raise ExtractionUnavailable(self.open_until - now)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.short_circuited += 1
+                raise ExtractionUnavailable(self.cooldown)
+            self._probing = True
+            return True
+        return False
+
+    def _open(self) -> None:
+        delay = backoff_delay(self._opens, self.cooldown, self.max_cooldown)
+        self._opens += 1
+        self._failures = 0
+        self.state = self.OPEN
+        self.open_until = time.monotonic() + delay
+        print(f"YouTube extraction paused for {delay:.0f}s after repeated failures")
+
+    def _on_throttled(self, probe: bool) -> None:
+        self.throttled += 1
+        self._decrease()
+        self._failures += 1
+        if probe or self._failures >= self.failure_threshold:
+            self._open()
+
+    def _on_success(self, probe: bool, latency: float | None) -> None:
+        self._failures = 0
+        if probe:
+            self.state = self.CLOSED
+            self._opens = 0
+            print("YouTube extraction resumed")
+        if latency is None:
+            return
+        if latency > self.latency_target:
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._wake()
+
+    # ----- Concurrency limit -----
+
+    def _decrease(self) -> None:
+        # Calls in flight during congestion all fail together, halve once for them
+        now = time.monotonic()
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit / 2)
+
+    async def _acquire(self) -> None:
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise ExtractionBusy(f"{len(self._waiters)} extractions waiting")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we were cancelled, hand it on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                # Cancelling the task cancels the future too, so it's done but
+                # still queued (unless _wake already skipped past it)
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def _release(self, probe: bool) -> None:
+        if probe:
+            self._probing = False
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "state": self.state,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "throttled": self.throttled,
+            "short_circuited": self.short_circuited,
+        }
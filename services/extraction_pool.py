@@ -0,0 +1,275 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    import yt_dlp
+
+
+class ExtractionError(Exception):
+    """yt-dlp failed to extract the requested media."""
+
+
+class ExtractionTimeout(ExtractionError):
+    """The extraction didn't finish within its deadline."""
+
+
+class ExtractionBusy(ExtractionError):
+    """The pool's request queue is full."""
+
+
+# ----- Worker side -----
+# Each worker thread (or process) owns its own YoutubeDL, built lazily from the
+# options handed to the initializer. yt_dlp itself is only imported by workers,
+# keeping it off the bot's startup path.
+
+_worker = threading.local()
+
+
+def _init_worker(
+    ydl_options: dict[str, Any], ydl_factory: Optional[Callable[..., Any]]
+) -> None:
+    import yt_dlp
+
+    _worker.options = ydl_options
+    _worker.factory = ydl_factory or yt_dlp.YoutubeDL
+    _worker.download_error = yt_dlp.utils.DownloadError
+    _worker.ydl = None
+    _worker.flat_ydl = None
+
+
+def _get_ydl() -> "yt_dlp.YoutubeDL":
+    if _worker.ydl is None:
+        _worker.ydl = _worker.factory(_worker.options)
+    return _worker.ydl
+
+
+def _get_flat_ydl() -> "yt_dlp.YoutubeDL":
+    """YoutubeDL that lists playlist entries without resolving each video."""
+    if _worker.flat_ydl is None:
+        options = {
+            **_worker.options,
+            "noplaylist": False,
+            "extract_flat": "in_playlist",
+        }
+        _worker.flat_ydl = _worker.factory(options)
+    return _worker.flat_ydl
+
+
+def extract_track(query: str) -> Optional[dict[str, Any]]:
+    """Worker job: resolve a query or URL to the fields we play from."""
+    try:
+        result = _get_ydl().extract_info(query, download=False)
+    except _worker.download_error as e:
+        # yt-dlp errors carry exc_info that doesn't pickle across processes
+        raise ExtractionError(str(e)) from None
+    if not result:
+        return None
+
+    if "entries" in result:
+        entries = result.get("entries") or []
+        if not entries:
+            return None
+        result = entries[0]
+
+    # Every direct audio-only stream, so playback can pick one per channel bitrate
+    formats = [
+        {
+            "url": f["url"],
+            "acodec": f.get("acodec"),
+            "abr": f.get("abr") or f.get("tbr"),
+        }
+        for f in result.get("formats") or []
+        if f.get("url")
+        and f.get("vcodec") in (None, "none")
+        and f.get("acodec") not in (None, "none")
+        and not str(f.get("protocol", "")).startswith("m3u8")
+    ]
+
+    return {
+        "id": result.get("id"),
+        "title": result.get("title"),
+        "webpage_url": result.get("webpage_url"),
+        "duration": result.get("duration"),
+        "stream_url": result.get("url"),
+        "thumbnail": result.get("thumbnail"),
+        "http_headers": result.get("http_headers") or {},
+        # Format of the selected stream, used to pick the playback path
+        "acodec": result.get("acodec"),
+        "abr": result.get("abr"),
+        "formats": formats,
+    }
+
+
+_UNAVAILABLE_TITLES = {"[Deleted video]", "[Private video]"}
+
+
+def extract_playlist_page(url: str, start: int, count: int) -> Optional[dict[str, Any]]:
+    """
+    Worker job: list ``count`` playlist entries from 1-based ``start`` as
+    lightweight placeholders. ``stream_url`` is left empty, it's resolved just
+    before the track plays.
+    """
+    ydl = _get_flat_ydl()
+    # Workers run one job at a time, so per-job params on their own instance are safe
+    ydl.params["playlist_items"] = f"{start}-{start + count - 1}"
+    try:
+        result = ydl.extract_info(url, download=False)
+    except _worker.download_error as e:
+        raise ExtractionError(str(e)) from None
+    if not result or "entries" not in result:
+        return None
+
+    raw_entries = [e for e in result.get("entries") or [] if e]
+    entries = []
+    for entry in raw_entries:
+        if not entry.get("id") or entry.get("title") in _UNAVAILABLE_TITLES:
+            continue
+        thumbnails = entry.get("thumbnails") or []
+        entries.append(
+            {
+                "id": entry["id"],
+                "title": entry.get("title"),
+                "webpage_url": entry.get("url")
+                or f"https://www.youtube.com/watch?v={entry['id']}",
+                "duration": entry.get("duration"),
+                "thumbnail": thumbnails[-1]["url"] if thumbnails else None,
+                "stream_url": None,
+                "http_headers": {},
+            }
+        )
+
+    return {
+        "title": result.get("title"),
+        "entries": entries,
+        # Unfiltered count, a short page means the playlist is exhausted
+        "listed": len(raw_entries),
+    }
+
+
+# ----- Pool -----
+
+
+class ExtractionPool:
+    """
+    Bounded pool of extraction workers, separate from the event loop's default
+    executor so slow extractions can't starve other blocking work.
+
+    ``mode`` is ``"thread"`` or ``"process"``; processes sidestep the GIL for
+    the CPU-heavy parts of extraction (JS challenge solving, JSON parsing).
+    At most ``workers + queue_size`` jobs are accepted at once; beyond that
+    ``ExtractionBusy`` is raised instead of queueing indefinitely.
+
+    ``ydl_factory`` builds each worker's YoutubeDL (default
+    ``yt_dlp.YoutubeDL``); it must be picklable (e.g. a module-level class) in
+    process mode. Workers are only started by the first job.
+    """
+
+    def __init__(
+        self,
+        ydl_options: dict[str, Any],
+        workers: int,
+        mode: str = "thread",
+        queue_size: int = 32,
+        timeout: float = 45.0,
+        ydl_factory: Optional[Callable[..., Any]] = None,
+    ) -> None:
+        self.workers = workers
+        self.mode = mode
+        self.timeout = timeout
+        self._capacity = workers + queue_size
+        self._in_flight = 0
+
+        # Finished jobs by outcome
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+        self._ydl_options = ydl_options
+        self._ydl_factory = ydl_factory
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            initargs = (self._ydl_options, self._ydl_factory)
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=initargs,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="extract",
+                    initializer=_init_worker,
+                    initargs=initargs,
+                )
+        return self._executor
+
+    @property
+    def in_flight(self) -> int:
+        """Jobs running or waiting for a worker."""
+        return self._in_flight
+
+    async def run(
+        self,
+        job: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Run ``job`` on a worker. Cancelling the awaiting task drops the job if
+        it hasn't started yet; a running job's result is discarded. Either way
+        a job keeps its place in the pool until a worker is done with it, so
+        jobs abandoned on timeout still count against the bound.
+        """
+        if self._in_flight >= self._capacity:
+            self.rejected += 1
+            raise ExtractionBusy(f"{self._in_flight} extractions already pending")
+
+        loop = asyncio.get_running_loop()
+        job_future = self._get_executor().submit(job, *args)
+        self._in_flight += 1
+        job_future.add_done_callback(lambda _: self._release(loop))
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(job_future), timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise ExtractionTimeout(f"extraction timed out: {args!r}") from None
+        except ExtractionError:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Runs on the worker's thread (or wherever the job was cancelled)
+        try:
+            loop.call_soon_threadsafe(self._job_done)
+        except RuntimeError:
+            # The loop is closed, nothing left to account for
+            pass
+
+    def _job_done(self) -> None:
+        self._in_flight -= 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "rejected": self.rejected,
+        }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,86 @@
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, Hashable
+
+
+class IdleReaper:
+    """
+    One timer for every guild's idle deadline.
+
+    Deadlines (``time.monotonic()`` values) sit in a heap with the current one
+    per key in a dict; rescheduling pushes a new entry and the superseded one
+    is skipped when it surfaces, so updates are O(log n) and never touch
+    other keys. A single task sleeps until the earliest deadline and hands
+    expired keys to ``on_expire``, which decides what to release.
+    """
+
+    def __init__(self, on_expire: Callable[[Hashable], Awaitable[None]]) -> None:
+        self.on_expire = on_expire
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._deadlines: dict[Hashable, float] = {}
+        self._sequence = 0  # tie breaker, keys needn't be comparable
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._expiring: set[asyncio.Task] = set()
+        self.expired = 0
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Set (or move) ``key``'s deadline."""
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        self._sequence += 1
+        heapq.heappush(self._heap, (deadline, self._sequence, key))
+        # Superseded entries pile up under frequent rescheduling; drop them now and then
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [
+                entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]
+            ]
+            heapq.heapify(self._heap)
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self, key: Hashable) -> None:
+        self._deadlines.pop(key, None)
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, key = heapq.heappop(self._heap)
+                if self._deadlines.get(key) != deadline:
+                    continue
+                del self._deadlines[key]
+                self.expired += 1
+                # Releasing a guild awaits Discord, don't hold up the others
+                task = asyncio.create_task(self._expire(key))
+                self._expiring.add(task)
+                task.add_done_callback(self._expiring.discard)
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _expire(self, key: Hashable) -> None:
+        try:
+            await self.on_expire(key)
+        except Exception as e:
+            print(f"Idle check for {key} failed: {e!r}")
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in self._expiring:
+            task.cancel()
+        self._heap.clear()
+        self._deadlines.clear()
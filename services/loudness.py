@@ -0,0 +1,159 @@
+import asyncio
+import os
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+@dataclass
+class Loudness:
+    integrated: float  # LUFS
+    true_peak: float  # dBTP
+
+
+# ebur128's summary, printed when ffmpeg closes the filter. Log lines may carry
+# a "[Parsed_ebur128_0 @ 0x...]" prefix.
+_INTEGRATED = re.compile(r"Integrated loudness:.*?I:\s*(\S+) LUFS", re.DOTALL)
+_TRUE_PEAK = re.compile(r"True peak:.*?Peak:\s*(\S+) dBFS", re.DOTALL)
+# ffmpeg's final progress report, the only one with -nostats
+_TIME = re.compile(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def parse_ebur128(log: str) -> Optional[Loudness]:
+    """The measurements of ffmpeg's ebur128 filter (with peak=true) from its log."""
+    integrated = _INTEGRATED.search(log)
+    true_peak = _TRUE_PEAK.search(log)
+    if integrated is None or true_peak is None:
+        return None
+    try:
+        loudness = Loudness(float(integrated.group(1)), float(true_peak.group(1)))
+    except ValueError:
+        return None
+    # Silence measures as -inf (or -70 LUFS, the gate), nothing sensible to correct
+    if loudness.integrated <= -70.0 or loudness.true_peak == float("-inf"):
+        return None
+    return loudness
+
+
+def parse_time(log: str) -> float:
+    """Seconds of audio ffmpeg reports having processed, 0 if it never said."""
+    matches = _TIME.findall(log)
+    if not matches:
+        return 0.0
+    hours, minutes, seconds = matches[-1]
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def gain_db(loudness: Loudness, target: float, max_true_peak: float) -> float:
+    """Gain in dB to bring a track to ``target`` LUFS without peaking above ``max_true_peak``."""
+    return min(target - loudness.integrated, max_true_peak - loudness.true_peak)
+
+
+class LoudnessStore:
+    """
+    Measured loudness per video ID, in memory and (when a path is given) in a
+    SQLite file so each video is only ever analysed once.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._measured: dict[str, Loudness] = {}
+        self._db: sqlite3.Connection | None = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS loudness (
+                    video_id TEXT PRIMARY KEY,
+                    integrated REAL NOT NULL,
+                    true_peak REAL NOT NULL,
+                    measured_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.commit()
+            for video_id, integrated, true_peak in self._db.execute(
+                "SELECT video_id, integrated, true_peak FROM loudness"
+            ):
+                self._measured[video_id] = Loudness(integrated, true_peak)
+
+    def get(self, video_id: str) -> Optional[Loudness]:
+        return self._measured.get(video_id)
+
+    def put(self, video_id: str, loudness: Loudness) -> None:
+        self._measured[video_id] = loudness
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO loudness VALUES (?, ?, ?, ?)",
+                (video_id, loudness.integrated, loudness.true_peak, time.time()),
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._measured)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class LoudnessAnalyzer:
+    """
+    Measures videos from the ffmpeg that plays them, so nothing is fetched or
+    decoded twice: a video's first play runs through ebur128, and once that
+    ffmpeg exits its log is checked on the log reader's thread. Plays that were
+    cut short (skips, dropped streams) are ignored. Results land in ``store``.
+    """
+
+    def __init__(self, store: LoudnessStore) -> None:
+        self.store = store
+        self.metered = 0
+        self.measured = 0
+        self.rejected = 0
+
+    def meter(self, video_id: str, min_seconds: float) -> Optional[Callable[[str], None]]:
+        """
+        Callback for the log of an ffmpeg playing ``video_id`` from the start
+        through ebur128, or None if the video is already measured. The play
+        counts once ffmpeg processed at least ``min_seconds`` of audio.
+        """
+        if self.store.get(video_id) is not None:
+            return None
+        loop = asyncio.get_running_loop()
+        self.metered += 1
+
+        def finish(log: str) -> None:
+            loudness = parse_ebur128(log)
+            if loudness is not None and parse_time(log) < min_seconds:
+                loudness = None
+            try:
+                loop.call_soon_threadsafe(self._finish, video_id, loudness)
+            except RuntimeError:
+                # The loop closed while the track was playing
+                pass
+
+        return finish
+
+    def _finish(self, video_id: str, loudness: Optional[Loudness]) -> None:
+        if loudness is None:
+            self.rejected += 1
+            return
+        self.measured += 1
+        self.store.put(video_id, loudness)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "known": len(self.store),
+            "metered": self.metered,
+            "measured": self.measured,
+            "rejected": self.rejected,
+        }
+
+    def close(self) -> None:
+        self.store.close()
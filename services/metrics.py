@@ -0,0 +1,243 @@
+import math
+import threading
+from typing import Callable, Iterable, Optional, TypeVar
+
+from aiohttp import web
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, object]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    A gauge either holds values set directly or is computed at scrape time
+    from ``set_function``, which returns ``{label values: value}``.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], dict[LabelValues, float]]] = None
+
+    def set(self, value: float, **labels: object) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Optional[Callable[[], dict[LabelValues, float]]]) -> None:
+        self._function = function
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        if self._function is not None:
+            items = list(self._function().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: bucket counts (non-cumulative), sum, count
+        self._series: dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ----- Extraction -----
+
+EXTRACTION_SECONDS = REGISTRY.register(
+    Histogram("luna_extraction_seconds", "yt-dlp extraction latency")
+)
+EXTRACTION_ERRORS = REGISTRY.register(
+    Counter("luna_extraction_errors_total", "Failed extractions", ["kind"])
+)
+SEARCH_CACHE_LOOKUPS = REGISTRY.register(
+    Counter("luna_search_cache_lookups_total", "Search cache outcomes", ["outcome"])
+)
+EXTRACTIONS_IN_FLIGHT = REGISTRY.register(
+    Gauge("luna_extractions_in_flight", "Extractions running or queued")
+)
+EXTRACTION_CONCURRENCY_LIMIT = REGISTRY.register(
+    Gauge("luna_extraction_concurrency_limit", "Current adaptive extraction concurrency")
+)
+EXTRACTION_BREAKER_OPEN = REGISTRY.register(
+    Gauge("luna_extraction_breaker_open", "1 while extractions are paused by the breaker")
+)
+
+# ----- Playback -----
+
+FFMPEG_SPAWN_SECONDS = REGISTRY.register(
+    Histogram(
+        "luna_ffmpeg_spawn_seconds",
+        "Time to spawn ffmpeg for a track",
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    )
+)
+FIRST_FRAME_SECONDS = REGISTRY.register(
+    Histogram(
+        "luna_first_frame_seconds", "Time from starting playback to the first audio frame"
+    )
+)
+TRACK_GAP_SECONDS = REGISTRY.register(
+    Histogram("luna_track_gap_seconds", "Silence between consecutive tracks")
+)
+AUDIO_UNDERRUNS = REGISTRY.register(
+    Counter("luna_audio_underruns_total", "Times playback waited on an empty read-ahead buffer")
+)
+AUDIO_UNDERRUN_SECONDS = REGISTRY.register(
+    Counter("luna_audio_underrun_seconds_total", "Time playback spent waiting on read-ahead")
+)
+
+# ----- Guilds -----
+
+# Aggregates only: a series per guild would grow with every guild ever seen
+QUEUED_TRACKS = REGISTRY.register(
+    Gauge("luna_queued_tracks", "Tracks waiting in all guilds' queues")
+)
+QUEUE_DEPTH_MAX = REGISTRY.register(
+    Gauge("luna_queue_depth_max", "Tracks waiting in the longest guild queue")
+)
+VOICE_CONNECTIONS = REGISTRY.register(
+    Gauge("luna_voice_connections", "Connected voice clients")
+)
+
+
+async def start_metrics_server(
+    host: str, port: int, registry: Registry = REGISTRY
+) -> web.AppRunner:
+    """Serve ``registry`` in the Prometheus text format on ``/metrics``."""
+
+    async def handle(_: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional, TextIO
+
+# The journal is one JSON array per line, each a change to one guild's session:
+#   ["join", guild, voice channel, status channel]   new session, replaces any old one
+#   ["voice", guild, voice channel, status channel]  moved or changed status channel
+#   ["add", guild, [track, ...]]                     appended to the queue
+#   ["remove", guild, index] / ["move", guild, index, new index]
+#   ["queue", guild, [track, ...]]                   whole queue replaced (shuffle)
+#   ["pop", guild]                                   head of the queue taken to play
+#   ["play", guild, track, seconds]                  playing a track from a position
+#   ["pos", guild, seconds]                          playback position checkpoint
+#   ["stop", guild]                                  nothing playing any more
+#   ["leave", guild]                                 session over
+# Tracks are opaque to the journal (see Track.to_record). Compaction rewrites
+# the file as join/queue/play records of the live sessions.
+
+# Compact once the records appended since the last snapshot outgrow both this and the snapshot
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+@dataclass
+class JournaledSession:
+    voice_channel_id: int
+    status_channel_id: Optional[int]
+    queue: deque = field(default_factory=deque)
+    playing: Optional[list] = None
+    position: float = 0.0
+
+
+def replay(lines: Iterable[str]) -> dict[int, JournaledSession]:
+    """Rebuild every guild's session from journal lines, skipping damaged ones."""
+    sessions: dict[int, JournaledSession] = {}
+    for line in lines:
+        try:
+            op, guild_id, *args = json.loads(line)
+        except ValueError:
+            # A torn final line from a crash mid-write
+            continue
+        session = sessions.get(guild_id)
+        if session is None and op != "join":
+            continue
+        try:
+            if op == "join":
+                sessions[guild_id] = JournaledSession(*args)
+            elif op == "voice":
+                session.voice_channel_id, session.status_channel_id = args
+            elif op == "add":
+                session.queue.extend(args[0])
+            elif op == "remove":
+                del session.queue[args[0]]
+            elif op == "move":
+                track = session.queue[args[0]]
+                del session.queue[args[0]]
+                session.queue.insert(args[1], track)
+            elif op == "queue":
+                session.queue = deque(args[0])
+            elif op == "pop":
+                session.queue.popleft()
+            elif op == "play":
+                session.playing, session.position = args
+            elif op == "pos":
+                session.position = args[0]
+            elif op == "stop":
+                session.playing = None
+            elif op == "leave":
+                del sessions[guild_id]
+        except (IndexError, ValueError, TypeError):
+            print(f"Skipping inconsistent journal record: {line.strip()[:200]}")
+    return sessions
+
+
+def session_records(guild_id: int, session: JournaledSession) -> list[list[Any]]:
+    """Records that rebuild ``session`` from nothing, for snapshots."""
+    records = [
+        ["join", guild_id, session.voice_channel_id, session.status_channel_id],
+        ["queue", guild_id, list(session.queue)],
+    ]
+    if session.playing is not None:
+        records.append(["play", guild_id, session.playing, session.position])
+    return records
+
+
+class QueueJournal:
+    """
+    Append-only log of every guild's queue and playback, so sessions survive a
+    restart or crash.
+
+    Each change is one short line written straight through (no fsync; the OS
+    keeps it if the process dies). Once enough has been appended, the live
+    state is written out as a fresh snapshot on a thread and atomically
+    swapped in, while changes made meanwhile are held back and appended to it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: TextIO | None = None
+        self._held: list[str] | None = None
+        self._compaction: asyncio.Task | None = None
+        self._snapshot_bytes = 0
+        self._appended_bytes = 0
+        self.compactions = 0
+
+    def load(self) -> dict[int, JournaledSession]:
+        """Replay the journal from disk and open it for appending."""
+        sessions: dict[int, JournaledSession] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                sessions = replay(f)
+            self._snapshot_bytes = os.path.getsize(self.path)
+        else:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return sessions
+
+    def append(self, record: list[Any]) -> None:
+        if self._file is None:
+            return
+        line = json.dumps(record, separators=(",", ":"))
+        if self._held is not None:
+            self._held.append(line)
+            return
+        self._write(line)
+
+    def _write(self, line: str) -> None:
+        assert self._file is not None
+        try:
+            self._file.write(line + "\n")
+            self._file.flush()
+        except OSError as e:
+            print(f"Queue journal write failed: {e}")
+            return
+        self._appended_bytes += len(line) + 1
+
+    def needs_compaction(self) -> bool:
+        return self._appended_bytes > max(COMPACT_MIN_BYTES, self._snapshot_bytes)
+
+    async def compact(self, snapshot: Callable[[], Iterable[list[Any]]]) -> None:
+        """
+        Replace the journal with ``snapshot()``, records rebuilding every live
+        session. Joins a compaction already running instead of starting another,
+        and isn't interrupted if the caller is cancelled.
+        """
+        if self._file is None:
+            return
+        if self._compaction is None or self._compaction.done():
+            self._compaction = asyncio.create_task(self._compact(snapshot))
+        await asyncio.shield(self._compaction)
+
+    async def _compact(self, snapshot: Callable[[], Iterable[list[Any]]]) -> None:
+        lines = [json.dumps(record, separators=(",", ":")) for record in snapshot()]
+        self._held = []
+        try:
+            size = await asyncio.to_thread(self._write_snapshot, lines)
+        except OSError as e:
+            print(f"Queue journal compaction failed: {e}")
+            size = None
+        held, self._held = self._held, None
+        if self._file is None:
+            return
+        if size is not None:
+            self._file.close()
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._snapshot_bytes = size
+            self._appended_bytes = 0
+            self.compactions += 1
+        for line in held:
+            self._write(line)
+
+    def _write_snapshot(self, lines: list[str]) -> int:
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(temp_path, self.path)
+        return size
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "snapshot_bytes": self._snapshot_bytes,
+            "appended_bytes": self._appended_bytes,
+            "compactions": self.compactions,
+        }
+
+    async def close(self) -> None:
+        """Stop recording; later appends are dropped, so tearing down keeps the sessions."""
+        if self._compaction is not None:
+            await self._compaction
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,312 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+_VIDEO_ID_PATTERNS = (
+    re.compile(r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/))([\w-]{11})"),
+    re.compile(r"youtu\.be/([\w-]{11})"),
+)
+
+
+def extract_video_id(query: str) -> Optional[str]:
+    """Return the YouTube video ID if the query is a video URL."""
+    for pattern in _VIDEO_ID_PATTERNS:
+        match = pattern.search(query)
+        if match:
+            return match.group(1)
+    return None
+
+
+_PLAYLIST_ID_PATTERN = re.compile(r"youtube\.com/.*[?&]list=([\w-]+)")
+
+
+def extract_playlist_id(query: str) -> Optional[str]:
+    """Return the playlist ID if the query is a YouTube URL carrying one."""
+    match = _PLAYLIST_ID_PATTERN.search(query)
+    return match.group(1) if match else None
+
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key for a query: the video ID for links, else folded text."""
+    video_id = extract_video_id(query)
+    if video_id:
+        return f"id:{video_id}"
+    return " ".join(query.lower().split())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stream_misses: int = 0
+    misses: int = 0
+    disk_hits: int = 0
+    saved_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "stream_misses": self.stream_misses,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+@dataclass
+class CachedTrack:
+    video_id: str
+    title: Optional[str]
+    webpage_url: Optional[str]
+    duration: Optional[float]
+    thumbnail: Optional[str]
+    stream_url: Optional[str]
+    http_headers: dict[str, str] = field(default_factory=dict)
+    acodec: Optional[str] = None
+    abr: Optional[float] = None
+    formats: list[dict[str, Any]] = field(default_factory=list)
+    resolved_at: float = 0.0
+    stream_resolved_at: float = 0.0
+    extract_seconds: float = 0.0
+
+
+# Bump when the table layout changes; the disk tier is rebuilt on mismatch
+SCHEMA_VERSION = 3
+
+
+class SearchCache:
+    """
+    Two-tier cache for search results.
+
+    The memory tier is an LRU bounded by entry count, the disk tier is a
+    SQLite file that survives restarts. Track metadata and the signed stream
+    URL expire independently: a stale stream URL still yields the metadata
+    (with ``stream_url`` set to None) so the caller can re-resolve the video
+    directly instead of repeating the search.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        metadata_ttl: float,
+        stream_ttl: float,
+    ) -> None:
+        self.max_entries = max_entries
+        self.metadata_ttl = metadata_ttl
+        self.stream_ttl = stream_ttl
+        self.stats = CacheStats()
+
+        self._tracks: OrderedDict[str, CachedTrack] = OrderedDict()
+        self._queries: OrderedDict[str, str] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        if path:
+            self._db = self._open(path)
+
+    # ----- Disk tier -----
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            db.execute("DROP TABLE IF EXISTS tracks")
+            db.execute("DROP TABLE IF EXISTS queries")
+            db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tracks (
+                video_id TEXT PRIMARY KEY,
+                title TEXT,
+                webpage_url TEXT,
+                duration REAL,
+                thumbnail TEXT,
+                stream_url TEXT,
+                http_headers TEXT,
+                acodec TEXT,
+                abr REAL,
+                formats TEXT,
+                resolved_at REAL,
+                stream_resolved_at REAL,
+                extract_seconds REAL
+            )
+            """
+        )
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT PRIMARY KEY,
+                video_id TEXT NOT NULL
+            )
+            """
+        )
+        db.commit()
+        return db
+
+    def _load_query(self, key: str) -> Optional[str]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT video_id FROM queries WHERE query = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _load_track(self, video_id: str) -> Optional[CachedTrack]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT video_id, title, webpage_url, duration, thumbnail, stream_url,"
+            " http_headers, acodec, abr, formats, resolved_at, stream_resolved_at,"
+            " extract_seconds"
+            " FROM tracks WHERE video_id = ?",
+            (video_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return CachedTrack(
+            video_id=row[0],
+            title=row[1],
+            webpage_url=row[2],
+            duration=row[3],
+            thumbnail=row[4],
+            stream_url=row[5],
+            http_headers=json.loads(row[6] or "{}"),
+            acodec=row[7],
+            abr=row[8],
+            formats=json.loads(row[9] or "[]"),
+            resolved_at=row[10] or 0.0,
+            stream_resolved_at=row[11] or 0.0,
+            extract_seconds=row[12] or 0.0,
+        )
+
+    def _store(self, keys: list[str], track: CachedTrack) -> None:
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                track.video_id,
+                track.title,
+                track.webpage_url,
+                track.duration,
+                track.thumbnail,
+                track.stream_url,
+                json.dumps(track.http_headers),
+                track.acodec,
+                track.abr,
+                json.dumps(track.formats),
+                track.resolved_at,
+                track.stream_resolved_at,
+                track.extract_seconds,
+            ),
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO queries VALUES (?, ?)",
+            [(key, track.video_id) for key in keys],
+        )
+        self._db.commit()
+
+    # ----- Memory tier -----
+
+    def _remember(self, key: str, track: CachedTrack) -> None:
+        self._tracks[track.video_id] = track
+        self._tracks.move_to_end(track.video_id)
+        self._queries[key] = track.video_id
+        self._queries.move_to_end(key)
+
+        while len(self._tracks) > self.max_entries:
+            self._tracks.popitem(last=False)
+        # Query aliases are cheap but still bounded
+        while len(self._queries) > self.max_entries * 2:
+            self._queries.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[CachedTrack]:
+        video_id = self._queries.get(key)
+        if video_id is None and key.startswith("id:"):
+            video_id = key[3:]
+        track = self._tracks.get(video_id) if video_id else None
+        if track is not None:
+            self._tracks.move_to_end(track.video_id)
+            return track
+
+        video_id = video_id or self._load_query(key)
+        track = self._load_track(video_id) if video_id else None
+        if track is not None:
+            self.stats.disk_hits += 1
+            self._remember(key, track)
+        return track
+
+    # ----- Public API -----
+
+    def get(self, query: str) -> Optional[dict[str, Any]]:
+        """
+        Look up a query. Returns None on a miss, otherwise the cached result;
+        ``stream_url`` is None when only the metadata is still fresh.
+        """
+        now = time.time()
+        track = self._lookup(normalize_query(query))
+        if track is None or now - track.resolved_at > self.metadata_ttl:
+            self.stats.misses += 1
+            return None
+
+        stream_fresh = (
+            track.stream_url is not None
+            and now - track.stream_resolved_at <= self.stream_ttl
+        )
+        if stream_fresh:
+            self.stats.hits += 1
+            self.stats.saved_seconds += track.extract_seconds
+        else:
+            self.stats.stream_misses += 1
+
+        return {
+            "id": track.video_id,
+            "title": track.title,
+            "webpage_url": track.webpage_url,
+            "duration": track.duration,
+            "thumbnail": track.thumbnail,
+            "stream_url": track.stream_url if stream_fresh else None,
+            "http_headers": dict(track.http_headers) if stream_fresh else {},
+            "acodec": track.acodec if stream_fresh else None,
+            "abr": track.abr if stream_fresh else None,
+            "formats": list(track.formats) if stream_fresh else [],
+        }
+
+    def put(self, query: str, info: dict[str, Any], extract_seconds: float) -> None:
+        """Store a freshly extracted result under the query and its video ID."""
+        video_id = info.get("id")
+        if not video_id:
+            return
+        now = time.time()
+        track = CachedTrack(
+            video_id=video_id,
+            title=info.get("title"),
+            webpage_url=info.get("webpage_url"),
+            duration=info.get("duration"),
+            thumbnail=info.get("thumbnail"),
+            stream_url=info.get("stream_url"),
+            http_headers=dict(info.get("http_headers") or {}),
+            acodec=info.get("acodec"),
+            abr=info.get("abr"),
+            formats=list(info.get("formats") or []),
+            resolved_at=now,
+            stream_resolved_at=now,
+            extract_seconds=extract_seconds,
+        )
+        keys = list({normalize_query(query), f"id:{video_id}"})
+        for key in keys:
+            self._remember(key, track)
+        self._store(keys, track)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
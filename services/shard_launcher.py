@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+import time
+from multiprocessing.process import BaseProcess
+
+import aiohttp
+
+from config import get_config
+from .bot_service import MusicBot
+
+config = get_config()
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+
+# Restart backoff for crashed workers, reset once a worker stays up long enough
+RESTART_DELAY_MIN = 1.0
+RESTART_DELAY_MAX = 60.0
+STABLE_AFTER = 300.0
+
+
+async def fetch_recommended_shards(token: str) -> int:
+    """Ask Discord how many shards the bot should run."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            GATEWAY_BOT_URL, headers={"Authorization": f"Bot {token}"}
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data["shards"]
+
+
+def split_shards(shard_count: int, processes: int) -> list[list[int]]:
+    """Contiguous shard ranges, as even as possible, one per process."""
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def run_worker(index: int, shard_ids: list[int], shard_count: int) -> None:
+    """Entry point of a worker process: one MusicBot for ``shard_ids``."""
+    started_at = time.perf_counter()
+    # Before the bot and its cogs build their caches from the config
+    config.use_shard_worker(index)
+
+    async def main() -> None:
+        bot = MusicBot(started_at=started_at, shard_ids=shard_ids, shard_count=shard_count)
+        loop = asyncio.get_running_loop()
+        try:
+            # The supervisor stops workers with SIGTERM; close cleanly
+            loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+        except NotImplementedError:
+            pass
+        async with bot:
+            await bot.start(config.discord_bot_key)
+
+    logging.info(f"Worker {index} running shards {shard_ids[0]}-{shard_ids[-1]}")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the whole process group; the supervisor handles it
+        pass
+
+
+class _Worker:
+    def __init__(self, index: int, shard_ids: list[int]) -> None:
+        self.index = index
+        self.shard_ids = shard_ids
+        self.process: BaseProcess | None = None
+        self.started_at = 0.0
+        self.restart_delay = RESTART_DELAY_MIN
+        self.restart_at: float | None = None
+
+
+class ShardSupervisor:
+    """
+    Spreads ``shard_count`` shards over ``processes`` worker processes, each
+    with its own guild state and caches, and restarts workers that exit
+    unexpectedly with exponential backoff.
+    """
+
+    def __init__(self, shard_count: int, processes: int) -> None:
+        self.shard_count = shard_count
+        self.workers = [
+            _Worker(i, shard_ids)
+            for i, shard_ids in enumerate(split_shards(shard_count, processes))
+        ]
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+
+    def _start(self, worker: _Worker) -> None:
+        worker.process = self._context.Process(
+            target=run_worker,
+            args=(worker.index, worker.shard_ids, self.shard_count),
+            name=f"shard-worker-{worker.index}",
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+
+    def _check(self, worker: _Worker) -> None:
+        now = time.monotonic()
+        if worker.restart_at is not None:
+            if now >= worker.restart_at:
+                self.restarts += 1
+                self._start(worker)
+            return
+
+        process = worker.process
+        if process is None or process.is_alive():
+            if now - worker.started_at >= STABLE_AFTER:
+                worker.restart_delay = RESTART_DELAY_MIN
+            return
+
+        logging.warning(
+            f"Worker {worker.index} exited with code {process.exitcode}, "
+            f"restarting in {worker.restart_delay:.0f}s"
+        )
+        worker.restart_at = now + worker.restart_delay
+        worker.restart_delay = min(worker.restart_delay * 2, RESTART_DELAY_MAX)
+
+    def stop(self, *_) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        logging.info(
+            f"Running {self.shard_count} shards in {len(self.workers)} processes"
+        )
+        for worker in self.workers:
+            self._start(worker)
+
+        while not self._stopping:
+            for worker in self.workers:
+                self._check(worker)
+            time.sleep(1)
+
+        logging.info("Stopping shard workers")
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout=15)
+                if worker.process.is_alive():
+                    worker.process.kill()
+
+
+def launch() -> None:
+    """Run the supervisor, resolving the shard count first if needed."""
+    shard_count = config.shard_count or asyncio.run(
+        fetch_recommended_shards(config.discord_bot_key)
+    )
+    ShardSupervisor(shard_count, config.shard_processes).run()
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+import discord
+
+# Discord allows 5 messages per 5 s per channel and 50 requests per second per
+# bot. Status traffic stays under both, leaving the rest of the global budget
+# to interaction responses, which never go through the dispatcher.
+CHANNEL_RATE = 1.0
+CHANNEL_BURST = 5
+GLOBAL_RATE = 30.0
+GLOBAL_BURST = 30
+
+StatusRenderer = Callable[[], Optional[discord.Embed]]
+
+
+class TokenBucket:
+    """``rate`` tokens per second, bursting up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def merge_notices(notices: list[discord.Embed]) -> discord.Embed:
+    """Combine a burst of notices into one embed."""
+    if len(notices) == 1:
+        return notices[0]
+    embed = discord.Embed(
+        title=f"📬 {len(notices)} Updates",
+        description="\n\n".join(
+            f"**{notice.title}**\n{notice.description or ''}".strip() for notice in notices
+        )[:4096],
+        color=notices[0].color,
+    )
+    return embed
+
+
+class _Outbox:
+    def __init__(self, channel: discord.abc.Messageable) -> None:
+        self.channel = channel
+        self.bucket = TokenBucket(CHANNEL_RATE, CHANNEL_BURST)
+        self.message: discord.Message | None = None
+        # Only the latest status counts; it's rendered when actually sent
+        self.render: StatusRenderer | None = None
+        self.repost = False
+        self.notices: list[discord.Embed] = []
+        self.task: asyncio.Task | None = None
+
+
+class StatusDispatcher:
+    """
+    Per-channel outbound queue for status messages.
+
+    Status updates are coalesced: only the most recent one is rendered, and it
+    edits the channel's status message instead of posting a new one (a new
+    track is reposted only if other messages have buried the old one).
+    Notices arriving within ``batch_window`` seconds of each other are sent as
+    one summary embed. Everything is paced by per-channel and global token
+    buckets so status traffic can't exhaust Discord's rate limits.
+    """
+
+    def __init__(self, batch_window: float = 1.0) -> None:
+        self.batch_window = batch_window
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._outboxes: dict[int, _Outbox] = {}
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+
+    def _outbox(self, channel: discord.abc.Messageable) -> _Outbox:
+        outbox = self._outboxes.get(channel.id)
+        if outbox is None:
+            outbox = self._outboxes[channel.id] = _Outbox(channel)
+        return outbox
+
+    def _schedule(self, outbox: _Outbox) -> None:
+        if outbox.task is None:
+            outbox.task = asyncio.create_task(self._drain(outbox))
+
+    def update_status(
+        self, channel: discord.abc.Messageable, render: StatusRenderer, repost: bool = False
+    ) -> None:
+        """
+        Queue a status update. ``repost`` asks for a new message (a new track)
+        rather than an edit, unless the status message is still the latest.
+        """
+        outbox = self._outbox(channel)
+        if outbox.render is not None:
+            self.coalesced += 1
+        outbox.render = render
+        outbox.repost = outbox.repost or repost
+        self._schedule(outbox)
+
+    def notify(self, channel: discord.abc.Messageable, embed: discord.Embed) -> None:
+        """Queue a one-off message, batched with others sent close together."""
+        outbox = self._outbox(channel)
+        outbox.notices.append(embed)
+        self._schedule(outbox)
+
+    def adopt(self, channel: discord.abc.Messageable, message: discord.Message) -> None:
+        """Use a message sent elsewhere (e.g. a command response) as the status message."""
+        self._outbox(channel).message = message
+
+    def forget(self, channel: discord.abc.Messageable) -> None:
+        """Drop the channel's status message and pending status, keeping notices."""
+        outbox = self._outboxes.get(channel.id)
+        if outbox is None:
+            return
+        outbox.message = None
+        outbox.render = None
+        outbox.repost = False
+        self._discard_if_idle(outbox)
+
+    def _discard_if_idle(self, outbox: _Outbox) -> None:
+        """Drop an outbox with nothing to send or edit, so left channels aren't kept."""
+        if (
+            outbox.task is None
+            and outbox.message is None
+            and outbox.render is None
+            and not outbox.notices
+            and self._outboxes.get(outbox.channel.id) is outbox
+        ):
+            del self._outboxes[outbox.channel.id]
+
+    async def _drain(self, outbox: _Outbox) -> None:
+        try:
+            while outbox.notices or outbox.render is not None:
+                # Let a burst collect before sending anything
+                await asyncio.sleep(self.batch_window)
+
+                notices, outbox.notices = outbox.notices, []
+                if notices:
+                    self.coalesced += len(notices) - 1
+                    await self._send(outbox, merge_notices(notices))
+
+                render, repost = outbox.render, outbox.repost
+                outbox.render, outbox.repost = None, False
+                if render is not None:
+                    embed = render()
+                    if embed is not None:
+                        await self._post_status(outbox, embed, repost)
+        finally:
+            outbox.task = None
+            self._discard_if_idle(outbox)
+
+    async def _post_status(self, outbox: _Outbox, embed: discord.Embed, repost: bool) -> None:
+        message = outbox.message
+        if message is not None and (
+            not repost or getattr(outbox.channel, "last_message_id", None) == message.id
+        ):
+            await self._take(outbox)
+            try:
+                await message.edit(embed=embed)
+                self.edited += 1
+                return
+            except discord.HTTPException:
+                # Deleted, or a command response whose token has expired
+                outbox.message = None
+        elif message is None and not repost:
+            return
+        sent = await self._send(outbox, embed)
+        if sent is not None:
+            outbox.message = sent
+
+    async def _take(self, outbox: _Outbox) -> None:
+        await outbox.bucket.take()
+        await self.global_bucket.take()
+
+    async def _send(self, outbox: _Outbox, embed: discord.Embed) -> discord.Message | None:
+        await self._take(outbox)
+        try:
+            message = await outbox.channel.send(embed=embed)
+        except discord.HTTPException as e:
+            print(f"Status message failed: {e}")
+            return None
+        self.sent += 1
+        return message
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "channels": len(self._outboxes),
+            "sent": self.sent,
+            "edited": self.edited,
+            "coalesced": self.coalesced,
+        }
+
+    def close(self) -> None:
+        for outbox in self._outboxes.values():
+            if outbox.task is not None:
+                outbox.task.cancel()
+        self._outboxes.clear()
@@ -0,0 +1,230 @@
+import bisect
+import heapq
+import os
+import sqlite3
+from typing import Optional
+
+from .search_cache import extract_video_id
+
+# Title words a suggestion can be matched from, besides the start of the title
+MAX_WORD_STARTS = 6
+# Matching keys examined per lookup, keeps lookups well inside Discord's deadline
+MAX_SCANNED = 2000
+
+
+def fold(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class _Video:
+    __slots__ = ("video_id", "title", "plays", "guild_plays")
+
+    def __init__(self, video_id: str, title: str) -> None:
+        self.video_id = video_id
+        self.title = title
+        self.plays = 0
+        self.guild_plays: dict[int, int] = {}
+
+
+class SuggestionIndex:
+    """
+    Prefix index of tracks we've already resolved, for autocomplete.
+
+    Titles are shared by all guilds and match from the start of any of their
+    first few words; queries typed in a guild only match in that guild. Keys
+    live in a sorted list, so a lookup is a binary search and a short scan,
+    with no network access. Suggestions are ranked by plays in the guild,
+    then plays overall. Everything is written through to SQLite (when a path
+    is given) and loaded on start; past ``max_videos`` the least played
+    tenth is dropped.
+    """
+
+    def __init__(self, path: str, max_videos: int) -> None:
+        self.max_videos = max_videos
+        self._videos: dict[str, _Video] = {}
+        # (folded text, guild ID or 0 for every guild, video ID)
+        self._keys: list[tuple[str, int, str]] = []
+        self._db: sqlite3.Connection | None = None
+        if path:
+            self._db = self._open(path)
+            self._load()
+
+    # ----- Disk -----
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                plays INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS guild_plays (
+                guild_id INTEGER NOT NULL,
+                video_id TEXT NOT NULL,
+                plays INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, video_id)
+            )
+            """
+        )
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queries (
+                guild_id INTEGER NOT NULL,
+                query TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                PRIMARY KEY (guild_id, query)
+            )
+            """
+        )
+        db.commit()
+        return db
+
+    def _load(self) -> None:
+        assert self._db is not None
+        for video_id, title, plays in self._db.execute(
+            "SELECT video_id, title, plays FROM videos"
+        ):
+            video = self._videos[video_id] = _Video(video_id, title)
+            video.plays = plays
+            self._keys.extend(self._title_keys(video))
+        for guild_id, video_id, plays in self._db.execute(
+            "SELECT guild_id, video_id, plays FROM guild_plays"
+        ):
+            video = self._videos.get(video_id)
+            if video is not None:
+                video.guild_plays[guild_id] = plays
+        for guild_id, query, video_id in self._db.execute(
+            "SELECT guild_id, query, video_id FROM queries"
+        ):
+            if video_id in self._videos:
+                self._keys.append((query, guild_id, video_id))
+        self._keys.sort()
+
+    # ----- Index -----
+
+    @staticmethod
+    def _title_keys(video: _Video) -> list[tuple[str, int, str]]:
+        words = fold(video.title).split(" ")
+        return [
+            (" ".join(words[i:]), 0, video.video_id)
+            for i in range(min(len(words), MAX_WORD_STARTS))
+            if words[i]
+        ]
+
+    def _add_key(self, key: tuple[str, int, str]) -> None:
+        i = bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            self._keys.insert(i, key)
+
+    def _video(self, video_id: str, title: Optional[str]) -> Optional[_Video]:
+        video = self._videos.get(video_id)
+        if video is not None or not title:
+            return video
+        if len(self._videos) >= self.max_videos:
+            self._evict()
+        video = self._videos[video_id] = _Video(video_id, title)
+        for key in self._title_keys(video):
+            self._add_key(key)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR IGNORE INTO videos (video_id, title) VALUES (?, ?)",
+                (video_id, title),
+            )
+        return video
+
+    def _evict(self) -> None:
+        count = max(1, len(self._videos) // 10)
+        dropped = {
+            v.video_id
+            for v in heapq.nsmallest(count, self._videos.values(), key=lambda v: v.plays)
+        }
+        for video_id in dropped:
+            del self._videos[video_id]
+        self._keys = [key for key in self._keys if key[2] not in dropped]
+        if self._db is not None:
+            ids = [(video_id,) for video_id in dropped]
+            self._db.executemany("DELETE FROM videos WHERE video_id = ?", ids)
+            self._db.executemany("DELETE FROM guild_plays WHERE video_id = ?", ids)
+            self._db.executemany("DELETE FROM queries WHERE video_id = ?", ids)
+
+    # ----- Public API -----
+
+    def record_query(
+        self, guild_id: int, query: str, video_id: Optional[str], title: Optional[str]
+    ) -> None:
+        """Remember that ``query`` resolved to a video in this guild."""
+        if not video_id or self._video(video_id, title) is None:
+            return
+        # Links are suggested by their title instead
+        if extract_video_id(query) is None:
+            key = fold(query)
+            if key:
+                self._add_key((key, guild_id, video_id))
+                if self._db is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                        (guild_id, key, video_id),
+                    )
+        if self._db is not None:
+            self._db.commit()
+
+    def record_play(self, guild_id: int, video_id: Optional[str], title: Optional[str]) -> None:
+        if not video_id:
+            return
+        video = self._video(video_id, title)
+        if video is None:
+            return
+        video.plays += 1
+        guild_plays = video.guild_plays[guild_id] = video.guild_plays.get(guild_id, 0) + 1
+        if self._db is not None:
+            self._db.execute(
+                "UPDATE videos SET plays = ? WHERE video_id = ?", (video.plays, video_id)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO guild_plays VALUES (?, ?, ?)",
+                (guild_id, video_id, guild_plays),
+            )
+            self._db.commit()
+
+    def suggest(self, guild_id: int, text: str, limit: int = 25) -> list[tuple[str, str]]:
+        """
+        Up to ``limit`` (video ID, title) pairs matching what's been typed so
+        far, most played first. With nothing typed, the most played overall.
+        """
+
+        def rank(video: _Video) -> tuple[int, int]:
+            return video.guild_plays.get(guild_id, 0), video.plays
+
+        prefix = fold(text)
+        if not prefix:
+            candidates = self._videos.values()
+        else:
+            matched: set[str] = set()
+            start = bisect.bisect_left(self._keys, (prefix,))
+            for key, key_guild, video_id in self._keys[start : start + MAX_SCANNED]:
+                if not key.startswith(prefix):
+                    break
+                if key_guild in (0, guild_id):
+                    matched.add(video_id)
+            candidates = [self._videos[video_id] for video_id in matched]
+        return [(v.video_id, v.title) for v in heapq.nlargest(limit, candidates, key=rank)]
+
+    def __len__(self) -> int:
+        return len(self._videos)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
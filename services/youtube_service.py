@@ -1,8 +1,62 @@
 import asyncio
-from typing import Any, Mapping, Optional
+import re
+import time
+from typing import Any, AsyncIterator, Container, Mapping, Optional
 
-import yt_dlp
 from config import get_config
+from .extraction_controller import (
+    ExtractionController,
+    ExtractionUnavailable,
+    backoff_delay,
+)
+from .extraction_pool import (
+    ExtractionBusy,
+    ExtractionError,
+    ExtractionPool,
+    ExtractionTimeout,
+    extract_playlist_page,
+    extract_track,
+)
+from .metrics import (
+    EXTRACTION_BREAKER_OPEN,
+    EXTRACTION_CONCURRENCY_LIMIT,
+    EXTRACTION_ERRORS,
+    EXTRACTION_SECONDS,
+    EXTRACTIONS_IN_FLIGHT,
+    SEARCH_CACHE_LOOKUPS,
+)
+from .search_cache import SearchCache, normalize_query
+from .single_flight import SingleFlight
+
+_EXPIRE_PATTERN = re.compile(r"[?&/]expire[=/](\d+)")
+
+
+def stream_expires_at(stream_url: str | None) -> Optional[float]:
+    """Unix time at which a signed googlevideo URL stops working, if known."""
+    if not stream_url:
+        return None
+    match = _EXPIRE_PATTERN.search(stream_url)
+    return float(match.group(1)) if match else None
+
+
+# Formats slightly under the target still count, YouTube's nominal bitrates vary
+_BITRATE_TOLERANCE = 0.9
+
+
+def select_audio_format(
+    formats: list[Mapping[str, Any]], target_kbps: float
+) -> Optional[Mapping[str, Any]]:
+    """
+    The cheapest audio format with at least ``target_kbps``, preferring Opus;
+    if none is good enough, the best one available.
+    """
+    usable = [f for f in formats if f.get("url") and f.get("abr")]
+    if not usable:
+        return None
+    good_enough = [f for f in usable if f["abr"] >= target_kbps * _BITRATE_TOLERANCE]
+    if good_enough:
+        return min(good_enough, key=lambda f: (f.get("acodec") != "opus", f["abr"]))
+    return min(usable, key=lambda f: (f.get("acodec") != "opus", -f["abr"]))
 
 
 class YouTubeService:
@@ -28,24 +82,157 @@ class YouTubeService:
             ydl_options["cookiefile"] = config.ytdl_cookies
             print(f"✓ Successfully loaded cookies file: {config.ytdl_cookies}")
 
-        self.ydl = yt_dlp.YoutubeDL(ydl_options)  # type: ignore
+        self.ydl_options = ydl_options
+        self.pool = ExtractionPool(
+            ydl_options,
+            workers=config.extraction_workers,
+            mode=config.extraction_mode,
+            queue_size=config.extraction_queue_size,
+            timeout=config.extraction_timeout,
+        )
+        self.controller = ExtractionController(
+            max_limit=config.extraction_workers,
+            queue_size=config.extraction_queue_size,
+            latency_target=config.extraction_latency_target,
+            failure_threshold=config.breaker_failure_threshold,
+            cooldown=config.breaker_cooldown,
+            max_cooldown=config.breaker_max_cooldown,
+        )
+        self.cache = SearchCache(
+            path=config.search_cache_path,
+            max_entries=config.search_cache_size,
+            metadata_ttl=config.search_cache_ttl,
+            stream_ttl=config.stream_url_ttl,
+        )
+        # Identical lookups in flight at the same time share one extraction
+        self.inflight = SingleFlight()
+        EXTRACTIONS_IN_FLIGHT.set_function(lambda: {(): self.pool.in_flight})
+        EXTRACTION_CONCURRENCY_LIMIT.set_function(lambda: {(): self.controller.limit})
+        EXTRACTION_BREAKER_OPEN.set_function(
+            lambda: {(): float(self.controller.state != ExtractionController.CLOSED)}
+        )
+
+    async def search(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        local_ids: Optional[Container[str]] = None,
+    ) -> Optional[Mapping[str, Any]]:
+        """
+        Resolve a query to a playable track, or None if nothing was found.
+
+        For video IDs in ``local_ids`` (audio already on disk) cached metadata
+        is returned as is, without resolving a stream URL.
+
+        Raises ExtractionBusy/ExtractionTimeout when the extraction pool is
+        saturated or the job outlives ``timeout``, and ExtractionUnavailable
+        while extraction is paused after repeated throttling.
+        """
+        cached = self.cache.get(query)
+        if cached is not None and cached["stream_url"]:
+            SEARCH_CACHE_LOOKUPS.inc(outcome="hit")
+            return cached
+        if cached is not None and local_ids is not None and cached["id"] in local_ids:
+            SEARCH_CACHE_LOOKUPS.inc(outcome="local")
+            return cached
+        SEARCH_CACHE_LOOKUPS.inc(outcome="miss" if cached is None else "stream_miss")
 
-    async def search(self, query: str) -> Optional[Mapping[str, Any]]:
-        result = await asyncio.to_thread(self.ydl.extract_info, query, download=False)
-        if not result:
+        # Metadata is still known, so resolve the video directly rather than searching
+        target = cached["webpage_url"] if cached and cached["webpage_url"] else query
+        return await self._resolve(target, timeout)
+
+    async def refresh(self, webpage_url: Optional[str]) -> Optional[Mapping[str, Any]]:
+        """Re-resolve the stream URL of an already known track, skipping the cache."""
+        if not webpage_url:
             return None
+        return await self._resolve(webpage_url)
 
-        if "entries" in result:
-            entries = result.get("entries") or []
-            if not entries:
-                return None
-            result = entries[0]
-
-        return {
-            "title": result.get("title"),
-            "webpage_url": result.get("webpage_url"),
-            "duration": result.get("duration"),
-            "stream_url": result.get("url"),
-            "thumbnail": result.get("thumbnail"),
-            "http_headers": result.get("http_headers") or {},
-        }
+    async def playlist_pages(
+        self, url: str, page_size: int, limit: int
+    ) -> AsyncIterator[tuple[Optional[str], list[dict[str, Any]]]]:
+        """
+        Lazily list a playlist, yielding ``(playlist title, placeholders)`` one
+        page at a time. Errors on the first page propagate; later pages wait out
+        a busy pool or paused extraction and stop quietly on any other failure.
+        """
+        start = 1
+        attempt = 0
+        while start <= limit:
+            count = min(page_size, limit - start + 1)
+            try:
+                page = await self.controller.run(
+                    lambda: self.pool.run(extract_playlist_page, url, start, count)
+                )
+            except ExtractionUnavailable as e:
+                if start == 1:
+                    raise
+                await asyncio.sleep(e.retry_after)
+                continue
+            except ExtractionBusy:
+                if start == 1:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, 2.0, 60.0))
+                attempt += 1
+                continue
+            except ExtractionError as e:
+                if start == 1:
+                    raise
+                print(f"Playlist listing stopped at {start} for {url!r}: {e}")
+                return
+
+            attempt = 0
+            if page is None:
+                return
+            if page["entries"]:
+                yield page["title"], page["entries"]
+            if page["listed"] < count:
+                return
+            start += count
+
+    async def _resolve(
+        self, target: str, timeout: Optional[float] = None
+    ) -> Optional[Mapping[str, Any]]:
+        """Extract ``target``, joining an identical extraction if one is running."""
+        shared = self.inflight.do(normalize_query(target), lambda: self._extract(target))
+        try:
+            info = await asyncio.wait_for(shared, timeout)
+        except asyncio.TimeoutError:
+            raise ExtractionTimeout(f"extraction timed out: {target!r}") from None
+        # Callers get their own copy, they annotate and mutate it
+        return dict(info) if info is not None else None
+
+    async def _extract(self, target: str) -> Optional[Mapping[str, Any]]:
+        started = time.perf_counter()
+        try:
+            info = await self.controller.run(lambda: self.pool.run(extract_track, target))
+        except ExtractionBusy:
+            EXTRACTION_ERRORS.inc(kind="busy")
+            raise
+        except ExtractionUnavailable:
+            EXTRACTION_ERRORS.inc(kind="unavailable")
+            raise
+        except ExtractionTimeout:
+            EXTRACTION_ERRORS.inc(kind="timeout")
+            raise
+        except ExtractionError as e:
+            EXTRACTION_ERRORS.inc(kind="error")
+            print(f"Extraction failed for {target!r}: {e}")
+            return None
+        elapsed = time.perf_counter() - started
+        EXTRACTION_SECONDS.observe(elapsed)
+        if info is None:
+            return None
+
+        self.cache.put(target, info, elapsed)
+        return info
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Hit/miss counters for the search cache."""
+        return self.cache.stats.as_dict()
+
+    def close(self) -> None:
+        EXTRACTIONS_IN_FLIGHT.set_function(None)
+        EXTRACTION_CONCURRENCY_LIMIT.set_function(None)
+        EXTRACTION_BREAKER_OPEN.set_function(None)
+        self.pool.close()
+        self.cache.close()